@@ -1,30 +1,72 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, session
+import os
 import random
+import time
+import uuid
 import numpy as np
+from compact import COMPACT_MIMETYPE, VALUE_DTYPES, GridEncoder
+from sessions import SessionStore
+from solver import (EVAL_SOLVERS, actions, boundary_blocked, evaluate_policy_sparse,
+                    policy_codes, sparse_available)
 
 app = Flask(__name__)
+# 多個 worker 行程時需設定相同的 SECRET_KEY，並以 sticky session 把同一使用者導向同一個行程
+app.secret_key = os.environ.get("SECRET_KEY") or os.urandom(24)
 
-# 初始化地圖
-n = 5  # 預設大小
-grid = [["" for _ in range(n)] for _ in range(n)]
-start = None
-end = None
-obstacles = set()
-actions = ["↑", "↓", "←", "→"]
-policy = [[random.choice(actions) for _ in range(n)] for _ in range(n)]
-value_function = np.zeros((n, n))
-
-def evaluate_policy():
-    """簡單的政策評估，計算 V(s)"""
-    global value_function
+
+class GridState:
+    """單一使用者的地圖與政策狀態"""
+
+    def __init__(self, size=5):
+        self.encoder = GridEncoder()  # 記錄上一次送給前端的內容，用於只傳變動的格子
+        self.reset(size)
+
+    def reset(self, size):
+        # 初始化地圖
+        self.n = size
+        self.grid = [["" for _ in range(size)] for _ in range(size)]
+        self.start = None
+        self.end = None
+        self.obstacles = set()
+        self.policy = [[random.choice(actions) for _ in range(size)] for _ in range(size)]
+        self.value_function = np.zeros((size, size))
+
+
+store = SessionStore(GridState, max_sessions=int(os.environ.get("MAX_SESSIONS", 1000)))
+
+
+def current_grid():
+    """取得目前使用者的 GridState，with 區塊內持有該 session 的鎖"""
+    if "sid" not in session:
+        session["sid"] = uuid.uuid4().hex
+    return store.session(session["sid"])
+
+def evaluate_policy(state, solver="direct"):
+    """簡單的政策評估，計算 V(s)
+
+    solver 為 "direct" 或 "bicgstab" 時，把政策寫成稀疏轉移矩陣並一次解出 (I - γP)V = r；
+    為 "iterative" 時沿用原本的反覆掃描。回傳實際使用的求解方法。
+    """
+    n, policy, obstacles = state.n, state.policy, state.obstacles
     gamma = 0.9  # 折扣因子
     delta = 1e-3  # 收斂閾值
 
+    if solver != "iterative" and sparse_available():
+        # 障礙物、起點與終點的價值保持不變
+        fixed_mask = np.zeros((n, n), dtype=bool)
+        for cell in obstacles | {state.start, state.end}:
+            if cell:
+                fixed_mask[cell] = True
+        state.value_function = evaluate_policy_sparse(policy_codes(policy), state.value_function, fixed_mask,
+                                                      boundary_blocked(n), gamma=gamma, method=solver)
+        return solver
+
+    value_function = state.value_function
     while True:
         new_value_function = np.copy(value_function)
         for i in range(n):
             for j in range(n):
-                if (i, j) in obstacles or (i, j) == start or (i, j) == end:
+                if (i, j) in obstacles or (i, j) == state.start or (i, j) == state.end:
                     continue
                 action = policy[i][j]
                 ni, nj = i, j
@@ -37,66 +79,97 @@ def evaluate_policy():
         if np.max(np.abs(new_value_function - value_function)) < delta:
             break
         value_function = new_value_function
+    state.value_function = value_function
+    return "iterative"
+
+def grid_format(data):
+    """解析前端要求的回應格式，預設 (JSON 巢狀串列) 時回傳 None"""
+    if data.get("format") != "compact" and COMPACT_MIMETYPE not in request.headers.get("Accept", ""):
+        return None
+    dtype = data.get("dtype", "float32")
+    return {"dtype": dtype if dtype in VALUE_DTYPES else "float32", "since": data.get("since")}
+
+def grid_payload(state, fmt=None, include_policy=True):
+    """價值與政策的回應內容：預設為 JSON 巢狀串列，fmt 指定時改用精簡的二進位格式
+
+    精簡格式一律附上政策代碼，才能與上一次送出的內容比對出變動的格子。
+    """
+    if fmt is None:
+        payload = {"values": state.value_function.tolist()}
+        if include_policy:
+            payload["policy"] = state.policy
+        return payload
+    return state.encoder.encode(state.value_function, policy_codes(state.policy), **fmt)
 
 @app.route('/')
 def index():
-    return render_template("index.html", n=n, grid=grid, policy=policy, value_function=value_function.tolist())
+    with current_grid() as state:
+        return render_template("index.html", n=state.n, grid=state.grid, policy=state.policy,
+                               value_function=state.value_function.tolist())
 
 @app.route('/set_size', methods=['POST'])
 def set_size():
-    global n, grid, policy, value_function, obstacles, start, end
     data = request.json
-    n = data["size"]
-    grid = [["" for _ in range(n)] for _ in range(n)]
-    policy = [[random.choice(actions) for _ in range(n)] for _ in range(n)]
-    value_function = np.zeros((n, n))
-    obstacles.clear()
-    start = None
-    end = None
-    return jsonify({
-        "message": "Grid size updated", 
-        "n": n, 
-        "policy": policy, 
-        "values": value_function.tolist()
-    })
+    with current_grid() as state:
+        state.reset(data["size"])
+        return jsonify({
+            "message": "Grid size updated",
+            "n": state.n,
+            **grid_payload(state, grid_format(data))
+        })
 
 @app.route('/update_cell', methods=['POST'])
 def update_cell():
-    global start, end, obstacles
     data = request.json
     x, y = data["x"], data["y"]
 
-    # 點擊設置起點、終點和障礙物
-    if (x, y) == start:
-        start = None  # 移除起點
-        return jsonify({"message": "Start removed"})
-    elif (x, y) == end:
-        end = None  # 移除終點
-        return jsonify({"message": "End removed"})
-    elif (x, y) in obstacles:
-        obstacles.remove((x, y))  # 移除障礙物
-        return jsonify({"message": "Obstacle removed"})
-    
-    if not start:  # 如果沒有設置起點，設置為起點
-        start = (x, y)
-        return jsonify({"message": "Start set"})
-    elif not end:  # 如果沒有設置終點，設置為終點
-        end = (x, y)
-        return jsonify({"message": "End set"})
-    else:  # 若已經設置了起點和終點，設置為障礙物
-        obstacles.add((x, y))
-        return jsonify({"message": "Obstacle set"})
+    with current_grid() as state:
+        # 點擊設置起點、終點和障礙物
+        if (x, y) == state.start:
+            state.start = None  # 移除起點
+            return jsonify({"message": "Start removed"})
+        elif (x, y) == state.end:
+            state.end = None  # 移除終點
+            return jsonify({"message": "End removed"})
+        elif (x, y) in state.obstacles:
+            state.obstacles.remove((x, y))  # 移除障礙物
+            return jsonify({"message": "Obstacle removed"})
+
+        if not state.start:  # 如果沒有設置起點，設置為起點
+            state.start = (x, y)
+            return jsonify({"message": "Start set"})
+        elif not state.end:  # 如果沒有設置終點，設置為終點
+            state.end = (x, y)
+            return jsonify({"message": "End set"})
+        else:  # 若已經設置了起點和終點，設置為障礙物
+            state.obstacles.add((x, y))
+            return jsonify({"message": "Obstacle set"})
 
 @app.route('/evaluate_policy', methods=['POST'])
 def evaluate():
-    evaluate_policy()
-    return jsonify({"message": "Policy evaluated", "values": value_function.tolist()})
+    data = request.get_json(silent=True) or {}
+    solver = data.get("solver", "direct")
+    if solver not in EVAL_SOLVERS:
+        return jsonify({"message": f"Unknown solver: {solver}"}), 400
+
+    with current_grid() as state:
+        t0 = time.perf_counter()
+        solver = evaluate_policy(state, solver)
+        elapsed = time.perf_counter() - t0
+        return jsonify({
+            "message": "Policy evaluated",
+            **grid_payload(state, grid_format(data), include_policy=False),
+            "solver": solver,
+            "elapsed_ms": round(elapsed * 1000, 3)
+        })
 
 @app.route('/reset_values', methods=['POST'])
 def reset_values():
-    global value_function
-    value_function = np.zeros((n, n))
-    return jsonify({"message": "Values reset", "values": value_function.tolist()})
+    data = request.get_json(silent=True) or {}
+    with current_grid() as state:
+        state.value_function = np.zeros((state.n, state.n))
+        return jsonify({"message": "Values reset",
+                        **grid_payload(state, grid_format(data), include_policy=False)})
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
@@ -0,0 +1,50 @@
+import base64
+
+import numpy as np
+
+# 以 Accept 標頭或請求中的 "format": "compact" 要求精簡格式
+COMPACT_MIMETYPE = "application/vnd.gridworld.compact+json"
+
+# 價值可選用的浮點格式 (little-endian)
+VALUE_DTYPES = {"float32": "<f4", "float16": "<f2"}
+
+
+def b64(array):
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
+
+class GridEncoder:
+    """把價值與政策編碼成精簡格式
+
+    價值為 float32/float16 的 little-endian 緩衝區，政策為 uint8 動作代碼，皆以 base64 放入 JSON。
+    記錄上一次送出的內容與版本號，客戶端帶上 since 且版本相符時，只送出有變動的格子。
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._values = None
+        self._codes = None
+
+    def encode(self, values, codes, dtype="float32", since=None):
+        values = np.asarray(values).astype(VALUE_DTYPES[dtype])
+        codes = np.asarray(codes).astype(np.uint8)
+
+        payload = {"format": "compact", "shape": list(values.shape), "dtype": dtype}
+        if since is not None and since == self.version and self._values is not None \
+                and self._values.shape == values.shape and self._values.dtype == values.dtype:
+            changed = np.flatnonzero((values != self._values) | (codes != self._codes))
+            payload.update({
+                "delta": True,
+                "base": since,
+                "indices": b64(changed.astype("<u4")),
+                "values": b64(values.ravel()[changed]),
+                "policy": b64(codes.ravel()[changed]),
+            })
+        else:
+            payload.update({"delta": False, "values": b64(values), "policy": b64(codes)})
+
+        self.version += 1
+        self._values = values
+        self._codes = codes
+        payload["version"] = self.version
+        return payload
@@ -0,0 +1,80 @@
+import numpy as np
+
+try:
+    import scipy.sparse as sp
+    from scipy.sparse.linalg import bicgstab, spsolve
+except ImportError:  # scipy 為選用套件，沒有安裝時只能使用迭代式政策評估
+    sp = None
+
+# 政策評估可選用的求解方法
+EVAL_SOLVERS = ("direct", "bicgstab", "iterative")
+
+actions = ["↑", "↓", "←", "→"]
+
+# 每個動作的位移 (列, 行)，順序與 actions 相同
+MOVES = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+def sparse_available():
+    return sp is not None
+
+
+def boundary_blocked(n):
+    """只考慮地圖邊界的 blocked 遮罩：走出地圖的動作留在原地"""
+    blocked = np.zeros((4, n, n), dtype=bool)
+    blocked[0, 0, :] = True
+    blocked[1, -1, :] = True
+    blocked[2, :, 0] = True
+    blocked[3, :, -1] = True
+    return blocked
+
+
+def policy_codes(policy):
+    """把箭頭政策 (list of lists) 轉成動作代碼陣列"""
+    lookup = {arrow: code for code, arrow in enumerate(actions)}
+    return np.array([[lookup[a] for a in row] for row in policy], dtype=np.intp)
+
+
+def transition_matrix(codes, blocked):
+    """確定性政策的轉移矩陣 P (CSR)，每一列只有一個 1，指向執行政策後到達的格子"""
+    n = codes.shape[0]
+    rows, cols = np.indices((n, n))
+    moves = np.array(MOVES)
+    stay = np.take_along_axis(blocked, codes[None], axis=0)[0]
+    ni = np.where(stay, rows, rows + moves[codes, 0])
+    nj = np.where(stay, cols, cols + moves[codes, 1])
+    size = n * n
+    return sp.csr_matrix((np.ones(size), (ni * n + nj).ravel(), np.arange(size + 1)), shape=(size, size))
+
+
+def evaluate_policy_sparse(codes, values, fixed_mask, blocked, gamma=0.9, method="direct"):
+    """以稀疏線性系統求解固定政策的 V(s)
+
+    非固定格子滿足 V = -1 + γPV，整理成 (I - γP_ff)V_f = -1 + γP_fx V_x，
+    其中 x 為價值保持不變的格子 (例如障礙物、起點、終點)。
+    method 為 "direct" 時以 spsolve 直接求解；為 "bicgstab" 時以目前的價值作為初始值迭代求解。
+    """
+    if not sparse_available():
+        raise ImportError("稀疏政策評估需要安裝 scipy")
+
+    n = codes.shape[0]
+    v = np.array(values, dtype=float).ravel()
+    free = np.flatnonzero(~fixed_mask)
+    fixed = np.flatnonzero(fixed_mask)
+    if free.size == 0:
+        return v.reshape(n, n)
+
+    P = transition_matrix(codes, blocked)[free]
+    A = sp.identity(free.size, format="csr") - gamma * P[:, free]
+    b = -1 + gamma * (P[:, fixed] @ v[fixed])
+
+    if method == "direct":
+        v[free] = spsolve(A.tocsc(), b)
+    elif method == "bicgstab":
+        x, info = bicgstab(A, b, x0=v[free], atol=1e-10)
+        if info != 0:
+            raise RuntimeError(f"bicgstab 未收斂 (info={info})")
+        v[free] = x
+    else:
+        raise ValueError(f"未知的求解方法: {method}")
+    return v.reshape(n, n)
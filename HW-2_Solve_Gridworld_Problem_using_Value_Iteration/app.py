@@ -1,32 +1,108 @@
-from flask import Flask, render_template, request, jsonify
-import random
+from flask import Flask, Response, render_template, request, jsonify, session
+import copy
+import os
+import time
+import uuid
 import numpy as np
+from bitmap import ObstacleBitmap, load_obstacle_map
+from cache import SolutionCache, layout_key
+from compact import COMPACT_MIMETYPE, VALUE_DTYPES, GridEncoder, b64
+from jobs import JobCancelled, JobManager
+from pathfinding import PATH_ENGINES, follow_policy, shortest_path
+from sessions import SessionStore
+from solver import (EVAL_SOLVERS, SOLVER_MODES, GridSolver, actions, boundary_blocked,
+                    evaluate_policy_sparse, policy_arrows, solve_with_stats, sparse_available)
 
 app = Flask(__name__)
+# 多個 worker 行程時需設定相同的 SECRET_KEY，並以 sticky session 把同一使用者導向同一個行程
+app.secret_key = os.environ.get("SECRET_KEY") or os.urandom(24)
 
-# 初始化地圖
-n = 5  # 預設大小
-grid = [["" for _ in range(n)] for _ in range(n)]
-start = None
-end = None
-obstacles = set()
-actions = ["↑", "↓", "←", "→"]
-policy = [[random.choice(actions) for _ in range(n)] for _ in range(n)]
-value_function = np.zeros((n, n))
-
-def evaluate_policy():
-    """簡單的政策評估，計算 V(s)"""
-    global value_function
+
+class GridState:
+    """單一使用者的地圖與求解狀態"""
+
+    def __init__(self, size=5):
+        self.encoder = GridEncoder()  # 記錄上一次送給前端的內容，用於只傳變動的格子
+        self.reset(size)
+
+    def reset(self, size):
+        # 初始化地圖
+        self.n = size
+        # 大地圖的價值改用 float32，回應中不再附上整張地圖，改由 /tile 分塊讀取
+        self.large = size * size > LARGE_MAP_CELLS
+        self.grid = None if self.large else [["" for _ in range(size)] for _ in range(size)]
+        self.start = None
+        self.end = None
+        self.obstacles = ObstacleBitmap(size)
+        # 政策以 actions 的索引 (uint8) 存放，回應時才轉成箭頭
+        self.policy = np.random.randint(len(actions), size=(size, size), dtype=np.uint8)
+        self.value_function = np.zeros((size, size), dtype=self.value_dtype)
+        self.solver = None  # 上一次價值迭代的求解器，切換障礙物時用來增量更新
+        self.job = None  # 正在背景執行的價值迭代工作
+
+    @property
+    def value_dtype(self):
+        return np.float32 if self.large else np.float64
+
+    def solver_options(self):
+        """大地圖以 float32 與分塊更新求解，控制暫存陣列的大小"""
+        if self.large:
+            return {"dtype": np.float32, "tile_rows": TILE_ROWS}
+        return {}
+
+
+MAX_CELLS = int(os.environ.get("MAX_CELLS", 4_000_000))  # /set_size 與上傳地圖允許的最大格數
+LARGE_MAP_CELLS = int(os.environ.get("LARGE_MAP_CELLS", 250_000))  # 超過此格數視為大地圖
+TILE_ROWS = int(os.environ.get("TILE_ROWS", 256))  # 大地圖每次 Bellman 更新的列數
+MAX_TILE = 512  # /tile 一次最多回傳的邊長
+
+store = SessionStore(GridState, max_sessions=int(os.environ.get("MAX_SESSIONS", 1000)))
+jobs = JobManager(max_workers=int(os.environ.get("SOLVER_WORKERS", 4)))
+
+solutions = SolutionCache(max_bytes=int(os.environ.get("SOLUTION_CACHE_MB", 64)) * 2**20,
+                          directory=os.environ.get("SOLUTION_CACHE_DIR"))
+
+GAMMA = 0.9  # 價值迭代的折扣因子
+THETA = 1e-3  # 價值迭代的收斂閾值
+SNAPSHOT_SIZE = 32  # 進度事件中價值快照的最大邊長
+
+
+def current_grid():
+    """取得目前使用者的 GridState，with 區塊內持有該 session 的鎖"""
+    if "sid" not in session:
+        session["sid"] = uuid.uuid4().hex
+    return store.session(session["sid"])
+
+def evaluate_policy(state, solver="direct"):
+    """簡單的政策評估，計算 V(s)
+
+    solver 為 "direct" 或 "bicgstab" 時，把政策寫成稀疏轉移矩陣並一次解出 (I - γP)V = r；
+    為 "iterative" 時沿用原本的反覆掃描。回傳實際使用的求解方法。
+    """
+    n, policy = state.n, state.policy
     gamma = 0.9  # 折扣因子
     delta = 1e-3  # 收斂閾值
 
+    # 障礙物、起點與終點的價值保持不變
+    fixed_mask = state.obstacles.to_mask()
+    for cell in (state.start, state.end):
+        if cell:
+            fixed_mask[cell] = True
+
+    if solver != "iterative" and sparse_available():
+        values = evaluate_policy_sparse(policy, state.value_function, fixed_mask,
+                                        boundary_blocked(n), gamma=gamma, method=solver)
+        state.value_function = values.astype(state.value_dtype, copy=False)
+        return solver
+
+    value_function = state.value_function
     while True:
         new_value_function = np.copy(value_function)
         for i in range(n):
             for j in range(n):
-                if (i, j) in obstacles or (i, j) == start or (i, j) == end:
+                if fixed_mask[i, j]:
                     continue
-                action = policy[i][j]
+                action = actions[policy[i, j]]
                 ni, nj = i, j
                 if action == "↑" and i > 0: ni -= 1
                 elif action == "↓" and i < n-1: ni += 1
@@ -37,215 +113,413 @@ def evaluate_policy():
         if np.max(np.abs(new_value_function - value_function)) < delta:
             break
         value_function = new_value_function
+    state.value_function = value_function
+    return "iterative"
 
-def value_iteration():
-    """價值迭代算法，計算最佳政策"""
-    global value_function, policy
-    gamma = 0.9  # 折扣因子
-    delta = 1e-3  # 收斂閾值
-    
-    # 初始化價值函數
-    value_function = np.zeros((n, n))
-    
-    # 設置終點價值
-    if end:
-        value_function[end[0], end[1]] = 0
-    
-    # 障礙物的處理方式修改：不顯示為無限值
-    for i in range(n):
-        for j in range(n):
-            if (i, j) in obstacles:
-                value_function[i, j] = -100  # 使用很低的值而非無限
-    
-    while True:
-        delta_value = 0
-        new_value_function = np.copy(value_function)
-        
-        for i in range(n):
-            for j in range(n):
-                if (i, j) in obstacles or (i, j) == end:
-                    continue
-                
-                # 計算每個動作的價值
-                action_values = []
-                
-                # 向上
-                if i > 0 and (i-1, j) not in obstacles:
-                    action_values.append((-1 + gamma * value_function[i-1, j], "↑"))
-                else:
-                    action_values.append((-1 + gamma * value_function[i, j], "↑"))
-                
-                # 向下
-                if i < n-1 and (i+1, j) not in obstacles:
-                    action_values.append((-1 + gamma * value_function[i+1, j], "↓"))
-                else:
-                    action_values.append((-1 + gamma * value_function[i, j], "↓"))
-                
-                # 向左
-                if j > 0 and (i, j-1) not in obstacles:
-                    action_values.append((-1 + gamma * value_function[i, j-1], "←"))
-                else:
-                    action_values.append((-1 + gamma * value_function[i, j], "←"))
-                
-                # 向右
-                if j < n-1 and (i, j+1) not in obstacles:
-                    action_values.append((-1 + gamma * value_function[i, j+1], "→"))
-                else:
-                    action_values.append((-1 + gamma * value_function[i, j], "→"))
-                
-                # 找出最佳動作及其價值
-                best_value, best_action = max(action_values)
-                
-                # 更新價值函數和政策
-                new_value_function[i, j] = best_value
-                policy[i][j] = best_action
-                
-                # 計算變化量
-                delta_value = max(delta_value, abs(new_value_function[i, j] - value_function[i, j]))
-        
-        # 更新價值函數
-        value_function = new_value_function
-        
-        # 檢查是否收斂
-        if delta_value < delta:
-            break
+def prepare_solver(state, incremental=True, detach=False):
+    """決定這次價值迭代使用的求解器，回傳 (solver, 是否增量更新)
 
-def find_optimal_path():
-    """基於當前政策找出從起點到終點的最佳路徑"""
-    if not start or not end:
-        return []
-    
-    path = [start]
-    current = start
-    
-    # 防止無限循環
-    max_steps = n * n
-    step_count = 0
-    
-    while current != end and step_count < max_steps:
-        i, j = current
-        action = policy[i][j]
-        
-        # 根據政策確定下一步
-        ni, nj = i, j
-        if action == "↑" and i > 0: ni -= 1
-        elif action == "↓" and i < n-1: ni += 1
-        elif action == "←" and j > 0: nj -= 1
-        elif action == "→" and j < n-1: nj += 1
-        
-        # 如果下一步是障礙物或走出邊界，結束
-        if (ni, nj) in obstacles or ni < 0 or ni >= n or nj < 0 or nj >= n:
-            break
-        
-        current = (ni, nj)
-        path.append(current)
-        step_count += 1
-        
-        # 如果回到已經訪問過的狀態，表示存在循環，則跳出
-        if path.count(current) > 1:
-            break
-    
-    # 檢查是否達到終點
-    if current != end:
-        return []  # 找不到有效路徑
-    
+    若上一次已收斂且之後只切換了障礙物，incremental 為 True 時沿用上一次的求解器，
+    只從變動的格子以 prioritized sweeping 增量更新，不必從零重新收斂。
+    大地圖的增量更新需要把整張價值表轉成 Python list，因此一律從頭求解。
+    detach 為 True 時複製一份求解器，讓背景工作不受之後的編輯影響。
+    """
+    solver = state.solver
+    if incremental and not state.large and solver is not None and solver.n == state.n and solver.end == state.end:
+        return (copy.deepcopy(solver) if detach else solver), True
+    return new_solver(state), False
+
+def new_solver(state):
+    # 障礙物、終點與四個方向的鄰居都預先轉成遮罩，每輪更新以整個陣列運算完成
+    return GridSolver(state.n, state.obstacles.to_mask(), state.end, gamma=GAMMA, theta=THETA,
+                      **state.solver_options())
+
+def run_solver(solver, incremental, progress=None, mode="jacobi", profile=False):
+    """執行求解，回傳 (價值函數, 最佳動作代碼, 統計資料)"""
+    if incremental:
+        t0 = time.perf_counter()
+        values, best_action, updates = solver.resolve(progress=progress)
+        stats = {"mode": "incremental", "updates": updates,
+                 "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3)}
+        return values, best_action, stats
+    return solve_with_stats(solver, mode, progress, profile)
+
+def install_solution(state, solver, values, best_action):
+    """把求解結果寫回 session，並把價值、政策與路徑存入快取，回傳最佳路徑"""
+    state.solver = solver
+    state.value_function = values.astype(state.value_dtype)
+    state.policy = solver.apply_codes(state.policy, best_action)
+    path = find_optimal_path(state, best_action)
+    solutions.put(solution_key(state), values, best_action, path)
     return path
 
+def solution_key(state):
+    return layout_key(state.n, state.start, state.end, state.obstacles, GAMMA, THETA)
+
+def install_cached(state):
+    """相同地圖已求解過時直接套用快取結果，回傳最佳路徑；沒有快取時回傳 None"""
+    cached = solutions.get(solution_key(state))
+    if cached is None:
+        return None
+    # 重建求解器並載入快取的價值，之後切換障礙物仍可增量更新
+    solver = new_solver(state)
+    solver.values = np.array(cached.values)
+    state.solver = solver
+    state.value_function = np.array(cached.values, dtype=state.value_dtype)
+    state.policy = solver.apply_codes(state.policy, cached.best_action)
+    return list(cached.path)
+
+def value_iteration(state, incremental=True, mode=None, profile=False):
+    """價值迭代算法，計算最佳政策，回傳 (最佳路徑, 統計資料)
+
+    mode 為 SOLVER_MODES 之一時，不使用快取與增量更新，直接以該模式從頭求解。
+    """
+    if mode is None:
+        path = install_cached(state)
+        if path is not None:
+            return path, {"mode": "cache"}
+    else:
+        incremental = False
+    solver, incremental = prepare_solver(state, incremental)
+    values, best_action, stats = run_solver(solver, incremental, mode=mode or "jacobi", profile=profile)
+    return install_solution(state, solver, values, best_action), stats
+
+def solve_job(job, solver, incremental, message, fmt=None, mode="jacobi", profile=False):
+    """背景工作：執行價值迭代並以事件回報每一輪的最大變化量與縮小後的價值快照"""
+    stride = max(1, -(-solver.n // SNAPSHOT_SIZE))
+
+    def progress(step, delta_value, values):
+        job.check_cancelled()
+        data = {"step": step, "delta": float(delta_value)}
+        if values is not None:
+            data["stride"] = stride
+            data["snapshot"] = values[::stride, ::stride].tolist()
+        job.emit("progress", data)
+
+    values, best_action, stats = run_solver(solver, incremental, progress, mode, profile)
+    with store.session(job.owner) as state:
+        # 送出後又有新的編輯時，這個結果已經過時
+        if job.cancelled or state.job is not job:
+            raise JobCancelled()
+        path = install_solution(state, solver, values, best_action)
+        state.job = None
+        return iteration_result(state, message, path, fmt, stats)
+
+def submit_value_iteration(state, message, incremental=True, fmt=None, mode=None, profile=False):
+    """把價值迭代送到背景執行緒池，立即回傳 Job"""
+    cancel_job(state)
+    solver, incremental = prepare_solver(state, incremental and mode is None, detach=True)
+    state.job = jobs.submit(solve_job, solver, incremental, message, fmt, mode or "jacobi", profile,
+                            owner=session["sid"])
+    return state.job
+
+def cancel_job(state):
+    """取消被新的編輯取代的背景工作"""
+    if state.job is not None:
+        state.job.cancel()
+        state.job = None
+
+def find_optimal_path(state, codes=None):
+    """基於當前政策找出從起點到終點的最佳路徑
+
+    codes 為整數動作代碼陣列 (例如價值迭代的最佳動作)；沒有提供時使用目前的政策。
+    """
+    if codes is None:
+        codes = state.policy
+    return follow_policy(lambda i, j: codes[i, j], state.n, state.start, state.end,
+                         lambda i, j: (i, j) in state.obstacles)
+
+def grid_format(data):
+    """解析前端要求的回應格式，預設 (JSON 巢狀串列) 時回傳 None"""
+    if data.get("format") != "compact" and COMPACT_MIMETYPE not in request.headers.get("Accept", ""):
+        return None
+    dtype = data.get("dtype", "float32")
+    return {"dtype": dtype if dtype in VALUE_DTYPES else "float32", "since": data.get("since")}
+
+def grid_payload(state, fmt=None, include_policy=True):
+    """價值與政策的回應內容：預設為 JSON 巢狀串列，fmt 指定時改用精簡的二進位格式
+
+    精簡格式一律附上政策代碼，才能與上一次送出的內容比對出變動的格子。
+    大地圖只回傳分塊資訊，價值與政策由 /tile 讀取。
+    """
+    if state.large:
+        return {"tiled": True, "maxTile": MAX_TILE}
+    if fmt is None:
+        payload = {"values": state.value_function.tolist()}
+        if include_policy:
+            payload["policy"] = policy_arrows(state.policy)
+        return payload
+    return state.encoder.encode(state.value_function, state.policy, **fmt)
+
+def iteration_result(state, message, path, fmt=None, stats=None):
+    result = {
+        "message": message,
+        "runIteration": True,
+        **grid_payload(state, fmt),
+        "path": path
+    }
+    if stats is not None:
+        result["stats"] = stats
+    return result
+
+def iteration_response(state, message, run_async=False, incremental=True, fmt=None, mode=None, profile=False):
+    """執行價值迭代並回傳結果；run_async 時改為送出背景工作，但快取命中時直接回傳結果"""
+    if run_async:
+        path = install_cached(state) if mode is None else None
+        if path is None:
+            job = submit_value_iteration(state, message, incremental, fmt, mode, profile)
+            return jsonify({"message": message, "runIteration": False, "job": job.id}), 202
+        stats = {"mode": "cache"}
+    else:
+        path, stats = value_iteration(state, incremental, mode, profile)
+    return jsonify(iteration_result(state, message, path, fmt, stats))
+
 @app.route('/')
 def index():
-    return render_template("index.html", n=n, grid=grid, policy=policy, value_function=value_function.tolist())
+    with current_grid() as state:
+        if state.large:
+            # 網頁只能編輯小地圖，大地圖請透過 API 操作
+            cancel_job(state)
+            state.reset(5)
+        return render_template("index.html", n=state.n, grid=state.grid, policy=policy_arrows(state.policy),
+                               value_function=state.value_function.tolist())
 
 @app.route('/set_size', methods=['POST'])
 def set_size():
-    global n, grid, policy, value_function, obstacles, start, end
     data = request.json
-    n = data["size"]
-    grid = [["" for _ in range(n)] for _ in range(n)]
-    policy = [[random.choice(actions) for _ in range(n)] for _ in range(n)]
-    value_function = np.zeros((n, n))
-    obstacles.clear()
-    start = None
-    end = None
-    return jsonify({
-        "message": "Grid size updated", 
-        "n": n, 
-        "policy": policy, 
-        "values": value_function.tolist()
-    })
+    size = data.get("size")
+    if not isinstance(size, int) or isinstance(size, bool) or size < 1 or size * size > MAX_CELLS:
+        return jsonify({"message": f"size must be an integer between 1 and {int(MAX_CELLS ** 0.5)}"}), 400
+
+    with current_grid() as state:
+        cancel_job(state)
+        state.reset(size)
+        return jsonify({
+            "message": "Grid size updated",
+            "n": state.n,
+            **grid_payload(state, grid_format(data))
+        })
 
 @app.route('/update_cell', methods=['POST'])
 def update_cell():
-    global start, end, obstacles
     data = request.json
     x, y = data["x"], data["y"]
     message = ""
     do_not_iterate = data.get("doNotIterate", False)
+    run_async = data.get("async", False)
+
+    with current_grid() as state:
+        if not (0 <= x < state.n and 0 <= y < state.n):
+            return jsonify({"message": "Cell out of range"}), 400
+        cancel_job(state)
+        # 點擊設置起點、終點和障礙物
+        if (x, y) == state.start:
+            state.start = None  # 移除起點
+            message = "起點已移除"
+        elif (x, y) == state.end:
+            state.end = None  # 移除終點
+            message = "終點已移除"
+        elif (x, y) in state.obstacles:
+            state.obstacles.remove((x, y))  # 移除障礙物
+            if state.solver is not None:
+                state.solver.set_obstacle(x, y, False)
+            message = "障礙物已移除"
+        elif not state.start:  # 設置起點
+            state.start = (x, y)
+            message = "起點已設置"
+        elif not state.end:  # 設置終點
+            state.end = (x, y)
+            message = "終點已設置"
+            # 當終點被設置後，如果不是禁止迭代的請求，自動執行價值迭代
+            if state.start and state.end and not do_not_iterate:
+                return iteration_response(state, message, run_async, fmt=grid_format(data))
+        else:  # 設置障礙物
+            state.obstacles.add((x, y))
+            if state.solver is not None:
+                state.solver.set_obstacle(x, y, True)
+            message = "障礙物已設置"
+            # 如果起點和終點都已設置，且不是禁止迭代的請求，自動執行價值迭代
+            if state.start and state.end and not do_not_iterate:
+                return iteration_response(state, message, run_async, fmt=grid_format(data))
 
-    # 點擊設置起點、終點和障礙物
-    if (x, y) == start:
-        start = None  # 移除起點
-        message = "起點已移除"
-    elif (x, y) == end:
-        end = None  # 移除終點
-        message = "終點已移除"
-    elif (x, y) in obstacles:
-        obstacles.remove((x, y))  # 移除障礙物
-        message = "障礙物已移除"
-    elif not start:  # 設置起點
-        start = (x, y)
-        message = "起點已設置"
-    elif not end:  # 設置終點
-        end = (x, y)
-        message = "終點已設置"
-        # 當終點被設置後，如果不是禁止迭代的請求，自動執行價值迭代
-        if start and end and not do_not_iterate:
-            value_iteration()
-            path = find_optimal_path()
-            return jsonify({
-                "message": message,
-                "runIteration": True,
-                "values": value_function.tolist(),
-                "policy": policy,
-                "path": path
-            })
-    else:  # 設置障礙物
-        obstacles.add((x, y))
-        message = "障礙物已設置"
-        # 如果起點和終點都已設置，且不是禁止迭代的請求，自動執行價值迭代
-        if start and end and not do_not_iterate:
-            value_iteration()
-            path = find_optimal_path()
-            return jsonify({
-                "message": message,
-                "runIteration": True,
-                "values": value_function.tolist(),
-                "policy": policy,
-                "path": path
-            })
-    
     return jsonify({"message": message, "runIteration": False})
 
 @app.route('/evaluate_policy', methods=['POST'])
 def evaluate():
-    evaluate_policy()
-    return jsonify({"message": "政策評估完成", "values": value_function.tolist()})
+    data = request.get_json(silent=True) or {}
+    solver = data.get("solver", "direct")
+    if solver not in EVAL_SOLVERS:
+        return jsonify({"message": f"Unknown solver: {solver}"}), 400
+
+    with current_grid() as state:
+        cancel_job(state)
+        t0 = time.perf_counter()
+        solver = evaluate_policy(state, solver)
+        elapsed = time.perf_counter() - t0
+        return jsonify({
+            "message": "政策評估完成",
+            **grid_payload(state, grid_format(data), include_policy=False),
+            "solver": solver,
+            "elapsed_ms": round(elapsed * 1000, 3)
+        })
 
 @app.route('/value_iteration', methods=['POST'])
 def run_value_iteration():
-    value_iteration()
-    path = find_optimal_path()
-    return jsonify({
-        "message": "價值迭代完成",
-        "values": value_function.tolist(),
-        "policy": policy,
-        "path": path
-    })
+    data = request.get_json(silent=True) or {}
+    incremental = data.get("incremental", True)
+    # 指定 mode 時以該模式從頭求解 (jacobi / gauss_seidel / distance / policy_iteration)，
+    # 回應的 stats 含迭代次數與耗時，profile 為 True 時另含峰值記憶體
+    mode = data.get("mode")
+    if mode is not None and mode not in SOLVER_MODES:
+        return jsonify({"message": f"Unknown mode: {mode}"}), 400
+    if mode == "policy_iteration" and not sparse_available():
+        return jsonify({"message": "policy_iteration requires scipy"}), 400
+
+    with current_grid() as state:
+        cancel_job(state)
+        return iteration_response(state, "價值迭代完成", data.get("async", False), incremental, grid_format(data),
+                                  mode, data.get("profile", False))
+
+@app.route('/find_path', methods=['POST'])
+def find_path():
+    """找出起點到終點的路徑
+
+    engine 為 "policy" 時依目前政策走；為 "bfs" 或 "astar" 時直接在障礙物地圖上搜尋最短路徑，
+    不需要先對整張地圖做價值迭代，適合超大地圖。
+    """
+    data = request.get_json(silent=True) or {}
+    engine = data.get("engine", "astar")
+    if engine not in PATH_ENGINES:
+        return jsonify({"message": f"Unknown engine: {engine}"}), 400
+
+    with current_grid() as state:
+        t0 = time.perf_counter()
+        if engine == "policy":
+            path = find_optimal_path(state)
+        else:
+            path = shortest_path(state.obstacles.to_mask(), state.start, state.end, engine)
+        elapsed = time.perf_counter() - t0
+        return jsonify({
+            "message": "路徑搜尋完成" if path else "找不到有效路徑",
+            "path": path,
+            "engine": engine,
+            "elapsed_ms": round(elapsed * 1000, 3)
+        })
+
+def parse_cell(text, mask):
+    """把上傳表單中的 "i,j" 轉成座標，空白時回傳 None"""
+    if not text:
+        return None
+    i, j = (int(v) for v in text.split(","))
+    if not (0 <= i < mask.shape[0] and 0 <= j < mask.shape[1]) or mask[i, j]:
+        raise ValueError(f"無效的格子: {text}")
+    return i, j
+
+@app.route('/upload_obstacles', methods=['POST'])
+def upload_obstacles():
+    """一次上傳整張障礙物地圖 (PNG 或 .npy)，地圖大小即為上傳陣列的邊長
+
+    檔案放在 multipart 的 "map" 欄位，或直接作為請求內容 (以 ?filename= 指定副檔名)；
+    可另外以 "start" 與 "end" 欄位 ("i,j") 指定起點與終點。
+    """
+    upload = request.files.get("map")
+    data = upload.read() if upload else request.get_data()
+    filename = upload.filename if upload else request.args.get("filename", "")
+    if not data:
+        return jsonify({"message": "No map uploaded"}), 400
+    try:
+        mask = load_obstacle_map(data, filename or "")
+        if mask.size > MAX_CELLS:
+            raise ValueError(f"地圖最多 {MAX_CELLS} 格，收到 {mask.size} 格")
+        start = parse_cell(request.values.get("start"), mask)
+        end = parse_cell(request.values.get("end"), mask)
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    with current_grid() as state:
+        cancel_job(state)
+        state.reset(mask.shape[0])
+        state.obstacles = ObstacleBitmap(state.n, mask)
+        state.start, state.end = start, end
+        return jsonify({
+            "message": "障礙物地圖已上傳",
+            "n": state.n,
+            "obstacles": len(state.obstacles),
+            "start": start,
+            "end": end,
+            **grid_payload(state, grid_format(request.values))
+        })
+
+@app.route('/tile')
+def tile():
+    """讀取價值與政策的一塊區域：?row=&col= 為左上角，size 為邊長 (最多 MAX_TILE)"""
+    try:
+        row = int(request.args.get("row", 0))
+        col = int(request.args.get("col", 0))
+        size = min(int(request.args.get("size", 64)), MAX_TILE)
+    except ValueError:
+        return jsonify({"message": "row, col and size must be integers"}), 400
+
+    with current_grid() as state:
+        if not (0 <= row < state.n and 0 <= col < state.n) or size < 1:
+            return jsonify({"message": "Tile out of range"}), 400
+        window = np.s_[row:row + size, col:col + size]
+        values = state.value_function[window]
+        codes = state.policy[window]
+        obstacles = state.obstacles.to_mask()[window]
+        result = {"row": row, "col": col, "shape": list(values.shape)}
+        fmt = grid_format(request.args)
+        if fmt is None:
+            result.update({"values": values.tolist(), "policy": policy_arrows(codes),
+                           "obstacles": obstacles.tolist()})
+        else:
+            result.update({"format": "compact", "dtype": fmt["dtype"],
+                           "values": b64(values.astype(VALUE_DTYPES[fmt["dtype"]])),
+                           "policy": b64(codes), "obstacles": b64(np.packbits(obstacles))})
+        return jsonify(result)
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(solutions.stats())
+
+def owned_job(job_id):
+    """只回傳屬於目前 session 的工作"""
+    job = jobs.get(job_id)
+    if job is None or job.owner != session.get("sid"):
+        return None
+    return job
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = owned_job(job_id)
+    if job is None:
+        return jsonify({"message": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    job = owned_job(job_id)
+    if job is None:
+        return jsonify({"message": "Job not found"}), 404
+    return Response(job.stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel(job_id):
+    job = owned_job(job_id)
+    if job is None:
+        return jsonify({"message": "Job not found"}), 404
+    job.cancel()
+    return jsonify(job.to_dict())
 
 @app.route('/reset_values', methods=['POST'])
 def reset_values():
-    global value_function
-    value_function = np.zeros((n, n))
-    return jsonify({"message": "Values reset", "values": value_function.tolist()})
+    data = request.get_json(silent=True) or {}
+    with current_grid() as state:
+        cancel_job(state)
+        state.value_function = np.zeros((state.n, state.n), dtype=state.value_dtype)
+        return jsonify({"message": "Values reset",
+                        **grid_payload(state, grid_format(data), include_policy=False)})
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
@@ -0,0 +1,155 @@
+"""
+benchmark.py
+
+比較原本的 Python 迴圈價值迭代與 GridSolver 向量化版本在不同地圖大小下的速度，
+並確認兩者算出的 value_function 與 policy 完全相同。
+加上 --modes 時改為比較各求解模式 (Jacobi / Gauss-Seidel / 距離排序 / 政策迭代) 在
+隨機、空曠與迷宮地圖上的迭代次數、耗時與峰值記憶體。
+
+用法：python benchmark.py --sizes 10 25 50 100 --density 0.2
+     python benchmark.py --modes --sizes 25 50 100
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from solver import SOLVER_MODES, GridSolver, actions, solve_with_stats
+
+
+def loop_value_iteration(n, obstacles, end, policy, gamma=0.9, delta=1e-3):
+    """原本 app.py 中以巢狀迴圈實作的價值迭代，作為比較基準"""
+    value_function = np.zeros((n, n))
+    if end:
+        value_function[end[0], end[1]] = 0
+    for i in range(n):
+        for j in range(n):
+            if (i, j) in obstacles:
+                value_function[i, j] = -100
+
+    while True:
+        delta_value = 0
+        new_value_function = np.copy(value_function)
+        for i in range(n):
+            for j in range(n):
+                if (i, j) in obstacles or (i, j) == end:
+                    continue
+                action_values = []
+                if i > 0 and (i-1, j) not in obstacles:
+                    action_values.append((-1 + gamma * value_function[i-1, j], "↑"))
+                else:
+                    action_values.append((-1 + gamma * value_function[i, j], "↑"))
+                if i < n-1 and (i+1, j) not in obstacles:
+                    action_values.append((-1 + gamma * value_function[i+1, j], "↓"))
+                else:
+                    action_values.append((-1 + gamma * value_function[i, j], "↓"))
+                if j > 0 and (i, j-1) not in obstacles:
+                    action_values.append((-1 + gamma * value_function[i, j-1], "←"))
+                else:
+                    action_values.append((-1 + gamma * value_function[i, j], "←"))
+                if j < n-1 and (i, j+1) not in obstacles:
+                    action_values.append((-1 + gamma * value_function[i, j+1], "→"))
+                else:
+                    action_values.append((-1 + gamma * value_function[i, j], "→"))
+                best_value, best_action = max(action_values)
+                new_value_function[i, j] = best_value
+                policy[i][j] = best_action
+                delta_value = max(delta_value, abs(new_value_function[i, j] - value_function[i, j]))
+        value_function = new_value_function
+        if delta_value < delta:
+            break
+    return value_function, policy
+
+
+def random_layout(n, density, rng):
+    """隨機產生終點與障礙物"""
+    cells = [(i, j) for i in range(n) for j in range(n)]
+    rng.shuffle(cells)
+    end = cells[0]
+    obstacles = set(cells[1:1 + int(density * n * n)])
+    return end, obstacles
+
+
+def open_layout(n, density, rng):
+    """沒有障礙物，終點在角落"""
+    return (n - 1, n - 1), set()
+
+
+def maze_layout(n, density, rng):
+    """蛇行走廊：奇數列為牆，缺口輪流開在最右與最左，價值必須沿著很長的路徑傳遞"""
+    obstacles = set()
+    for r in range(1, n - 1, 2):
+        gap = n - 1 if (r // 2) % 2 == 0 else 0
+        obstacles.update((r, c) for c in range(n) if c != gap)
+    return (n - 1, n - 1) if (n - 1) % 2 == 0 else (n - 1, 0), obstacles
+
+
+LAYOUTS = {"random": random_layout, "open": open_layout, "maze": maze_layout}
+
+
+def compare_modes(sizes, density, rng):
+    print(f"{'layout':>8} {'n':>6} {'mode':>18} {'sweeps':>8} {'time (ms)':>11} {'peak (KB)':>11} {'max diff':>10}")
+    for name, layout in LAYOUTS.items():
+        for n in sizes:
+            end, obstacles = layout(n, density, rng)
+            reference = None
+            for mode in SOLVER_MODES:
+                solver = GridSolver(n, obstacles, end)
+                try:
+                    values, _, stats = solve_with_stats(solver, mode, profile=True)
+                except RuntimeError as exc:  # 沒有安裝 scipy 時無法做政策迭代
+                    print(f"{name:>8} {n:>6} {mode:>18}  skipped: {exc}")
+                    continue
+                if reference is None:
+                    reference = values
+                diff = np.max(np.abs(values - reference))
+                print(f"{name:>8} {n:>6} {mode:>18} {stats['sweeps']:>8} {stats['elapsed_ms']:>11.2f} "
+                      f"{stats['peak_memory_kb']:>11.1f} {diff:>10.4f}")
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--density", type=float, default=0.2, help="障礙物比例")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", action="store_true", help="比較各求解模式")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.modes:
+        compare_modes(args.sizes, args.density, rng)
+        return
+
+    print(f"{'n':>6} {'loop (s)':>12} {'vectorized (s)':>16} {'speedup':>10} {'match':>7}")
+    for n in args.sizes:
+        end, obstacles = random_layout(n, args.density, rng)
+        policy = [[rng.choice(actions) for _ in range(n)] for _ in range(n)]
+
+        t_loop, (v_loop, p_loop) = timed(
+            lambda: loop_value_iteration(n, obstacles, end, [row[:] for row in policy]), args.repeat)
+
+        def vectorized():
+            solver = GridSolver(n, obstacles, end)
+            values, best_action, _ = solver.value_iteration()
+            return values, solver.apply_policy(policy, best_action)
+
+        t_vec, (v_vec, p_vec) = timed(vectorized, args.repeat)
+        match = np.array_equal(v_loop, v_vec) and p_loop == p_vec
+        print(f"{n:>6} {t_loop:>12.4f} {t_vec:>16.4f} {t_loop / t_vec:>9.1f}x {str(match):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import io
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 為選用套件，沒有安裝時只能上傳 .npy 地圖
+    Image = None
+
+
+class ObstacleBitmap:
+    """以位元壓縮存放的障礙物地圖，每格只佔 1 bit
+
+    提供與原本 set of (i, j) 相同的操作 (in / add / remove / discard / 迭代 / len)，
+    百萬格的地圖也只需要幾百 KB。
+    """
+
+    def __init__(self, n, mask=None):
+        self.n = n
+        if mask is None:
+            self.packed = np.zeros(-(-n * n // 8), dtype=np.uint8)
+            self._count = 0
+        else:
+            mask = np.asarray(mask, dtype=bool)
+            if mask.shape != (n, n):
+                raise ValueError(f"障礙物地圖大小應為 {(n, n)}，收到 {mask.shape}")
+            self.packed = np.packbits(mask.ravel())
+            self._count = int(np.count_nonzero(mask))
+
+    def _locate(self, cell):
+        i, j = cell
+        if not (0 <= i < self.n and 0 <= j < self.n):
+            return None, 0
+        k = i * self.n + j
+        return k >> 3, 0x80 >> (k & 7)
+
+    def __contains__(self, cell):
+        byte, bit = self._locate(cell)
+        return byte is not None and bool(self.packed[byte] & bit)
+
+    def add(self, cell):
+        byte, bit = self._locate(cell)
+        if byte is None:
+            raise IndexError(f"格子超出地圖範圍: {cell}")
+        if not self.packed[byte] & bit:
+            self.packed[byte] |= bit
+            self._count += 1
+
+    def discard(self, cell):
+        byte, bit = self._locate(cell)
+        if byte is not None and self.packed[byte] & bit:
+            self.packed[byte] &= ~bit & 0xFF
+            self._count -= 1
+
+    def remove(self, cell):
+        if cell not in self:
+            raise KeyError(cell)
+        self.discard(cell)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for k in np.flatnonzero(self.to_mask().ravel()):
+            yield divmod(int(k), self.n)
+
+    def to_mask(self):
+        """展開成 (n, n) 的布林陣列"""
+        return np.unpackbits(self.packed, count=self.n * self.n).view(bool).reshape(self.n, self.n)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+
+def load_obstacle_map(data, filename=""):
+    """解析上傳的障礙物地圖，回傳 (n, n) 的布林陣列
+
+    .npy 檔中非零的格子為障礙物；PNG 等圖片轉成灰階後，深色 (< 128) 的像素為障礙物。
+    """
+    if filename.lower().endswith(".npy") or data[:6] == b"\x93NUMPY":
+        array = np.load(io.BytesIO(data), allow_pickle=False)
+        mask = array != 0
+    else:
+        if Image is None:
+            raise ValueError("需要安裝 Pillow 才能讀取圖片，或改為上傳 .npy 檔")
+        try:
+            image = Image.open(io.BytesIO(data))
+            mask = np.asarray(image.convert("L")) < 128
+        except OSError as exc:
+            raise ValueError("無法讀取圖片，請上傳 PNG 或 .npy 檔") from exc
+
+    if mask.ndim != 2 or mask.shape[0] != mask.shape[1]:
+        raise ValueError(f"障礙物地圖必須是正方形的二維陣列，收到 {mask.shape}")
+    return mask
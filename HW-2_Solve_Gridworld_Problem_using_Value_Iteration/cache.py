@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def layout_key(n, start, end, obstacles, gamma, theta):
+    """以 (n, start, end, 排序後的障礙物, gamma, theta) 的標準化 JSON 計算 SHA-256 作為快取鍵
+
+    obstacles 為 ObstacleBitmap 時改用壓縮位元的雜湊，大地圖不必展開成座標串列。
+    """
+    if hasattr(obstacles, "packed"):
+        obstacles_key = hashlib.sha256(obstacles.packed.tobytes()).hexdigest()
+    else:
+        obstacles_key = sorted([i, j] for i, j in obstacles)
+    layout = {
+        "n": n,
+        "start": list(start) if start else None,
+        "end": list(end) if end else None,
+        "obstacles": obstacles_key,
+        "gamma": gamma,
+        "theta": theta,
+    }
+    canonical = json.dumps(layout, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Solution:
+    """已求解的地圖：價值函數、最佳動作代碼與最佳路徑"""
+
+    def __init__(self, values, best_action, path):
+        self.values = values
+        self.best_action = best_action
+        self.path = [tuple(p) for p in path]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.best_action.nbytes + 16 * len(self.path)
+
+
+class SolutionCache:
+    """以內容雜湊為鍵的求解結果快取
+
+    記憶體中以 LRU 淘汰，總大小不超過 max_bytes；設定 directory 時每筆結果同時以一個 .npz 寫入磁碟，
+    記憶體中被淘汰或重新啟動後仍可讀回。
+    """
+
+    def __init__(self, max_bytes=64 * 2**20, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            solution = self._entries.get(key)
+            if solution is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return solution
+
+        solution = self._load(key)
+        with self._lock:
+            if solution is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._insert(key, solution)
+        return solution
+
+    def put(self, key, values, best_action, path):
+        solution = Solution(np.array(values), np.asarray(best_action, dtype=np.uint8), path)
+        with self._lock:
+            self._insert(key, solution)
+        self._save(key, solution)
+        return solution
+
+    def _insert(self, key, solution):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[key] = solution
+        self._bytes += solution.nbytes
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _filename(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def _save(self, key, solution):
+        if not self.directory:
+            return
+        path = np.array(solution.path, dtype=np.int32).reshape(-1, 2)
+        # 三個陣列寫進同一個檔案，每次寫入各用一個暫存檔再改名：同一個鍵同時有多個寫入者時，
+        # 讀者只會看到某一次完整的寫入，不會讀到寫到一半或混合兩次寫入的結果
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=key + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, values=solution.values, best_action=solution.best_action, path=path)
+            os.replace(tmp, self._filename(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        try:
+            with np.load(self._filename(key)) as data:
+                return Solution(data["values"], data["best_action"], data["path"].tolist())
+        except FileNotFoundError:
+            return None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "directory": self.directory,
+            }
@@ -0,0 +1,107 @@
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """工作已被取消 (例如使用者又編輯了地圖)"""
+
+
+class Job:
+    """一個在背景執行的求解工作，保存進度事件供 Server-Sent Events 串流"""
+
+    def __init__(self, owner=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner  # 送出工作的 session id
+        self.status = "queued"  # queued / running / done / cancelled / error
+        self.result = None
+        self.error = None
+        self._events = []  # (event name, data)
+        self._cond = threading.Condition()
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "cancelled", "error")
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def emit(self, event, data):
+        with self._cond:
+            self._events.append((event, data))
+            self._cond.notify_all()
+
+    def finish(self, status, result=None, error=None):
+        with self._cond:
+            self.status = status
+            self.result = result
+            self.error = error
+            self._events.append((status, result if status == "done" else {"error": error}))
+            self._cond.notify_all()
+
+    def stream(self, timeout=15):
+        """逐一產生 SSE 格式的事件；沒有新事件時定期送出註解保持連線"""
+        index = 0
+        while True:
+            with self._cond:
+                if index >= len(self._events) and not self.finished:
+                    self._cond.wait(timeout)
+                events = self._events[index:]
+                index += len(events)
+                finished = self.finished and index >= len(self._events)
+            if not events and not finished:
+                yield ": keep-alive\n\n"
+            for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            if finished:
+                return
+
+    def to_dict(self):
+        return {"job": self.id, "status": self.status, "result": self.result, "error": self.error}
+
+
+class JobManager:
+    """以執行緒池執行求解工作，並保留最近 max_jobs 個工作的狀態"""
+
+    def __init__(self, max_workers=4, max_jobs=1000):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, owner=None):
+        """送出工作 fn(job, *args)，立即回傳 Job；fn 的回傳值成為工作結果"""
+        job = Job(owner)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self.executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        if job.cancelled:
+            job.finish("cancelled")
+            return
+        job.status = "running"
+        try:
+            job.finish("done", result=fn(job, *args))
+        except JobCancelled:
+            job.finish("cancelled")
+        except Exception as e:
+            job.finish("error", error=str(e))
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
@@ -0,0 +1,98 @@
+import heapq
+from collections import deque
+
+from solver import MOVES
+
+# 路徑搜尋可選用的方法："policy" 依目前政策走，"bfs"/"astar" 直接在障礙物地圖上找最短路徑
+PATH_ENGINES = ("policy", "bfs", "astar")
+
+
+def follow_policy(next_action, n, start, end, is_obstacle):
+    """依政策從起點走到終點，找不到時回傳空串列
+
+    next_action(i, j) 回傳該格的動作代碼，is_obstacle(i, j) 判斷是否為障礙物。
+    以 visited 集合偵測循環，整體為 O(路徑長度)。
+    """
+    if not start or not end:
+        return []
+
+    path = [start]
+    visited = {start}
+    current = start
+    while current != end:
+        i, j = current
+        di, dj = MOVES[next_action(i, j)]
+        ni, nj = i + di, j + dj
+
+        # 如果下一步是障礙物或走出邊界，結束
+        if ni < 0 or ni >= n or nj < 0 or nj >= n or is_obstacle(ni, nj):
+            return []
+
+        current = (ni, nj)
+        # 如果回到已經訪問過的狀態，表示存在循環
+        if current in visited:
+            return []
+        visited.add(current)
+        path.append(current)
+
+    return path
+
+
+def _neighbors(cell, n, obstacle_mask):
+    i, j = cell
+    for di, dj in MOVES:
+        ni, nj = i + di, j + dj
+        if 0 <= ni < n and 0 <= nj < n and not obstacle_mask[ni, nj]:
+            yield ni, nj
+
+
+def _reconstruct(parent, end):
+    path = [end]
+    while parent[path[-1]] is not None:
+        path.append(parent[path[-1]])
+    path.reverse()
+    return path
+
+
+def shortest_path(obstacle_mask, start, end, engine="astar"):
+    """在障礙物布林地圖上以 BFS 或 A* (曼哈頓距離) 找出步數最少的路徑
+
+    每步獎勵固定為 -1，因此步數最少的路徑就是最佳路徑，不需要先做價值迭代。
+    """
+    if not start or not end or obstacle_mask[start] or obstacle_mask[end]:
+        return []
+    n = obstacle_mask.shape[0]
+    parent = {start: None}
+
+    if engine == "bfs":
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            if cell == end:
+                return _reconstruct(parent, end)
+            for nxt in _neighbors(cell, n, obstacle_mask):
+                if nxt not in parent:
+                    parent[nxt] = cell
+                    queue.append(nxt)
+        return []
+
+    if engine == "astar":
+        ei, ej = end
+        cost = {start: 0}
+        # 估計值相同時優先展開已走較遠的格子 (-g 較小)
+        heap = [(abs(start[0] - ei) + abs(start[1] - ej), 0, start)]
+        while heap:
+            _, neg_g, cell = heapq.heappop(heap)
+            g = -neg_g
+            if cell == end:
+                return _reconstruct(parent, end)
+            if g > cost[cell]:
+                continue  # 過期的佇列項目
+            for nxt in _neighbors(cell, n, obstacle_mask):
+                if g + 1 < cost.get(nxt, g + 2):
+                    cost[nxt] = g + 1
+                    parent[nxt] = cell
+                    heapq.heappush(heap, (g + 1 + abs(nxt[0] - ei) + abs(nxt[1] - ej), -(g + 1), nxt))
+        return []
+
+    raise ValueError(f"未知的路徑搜尋方法: {engine}")
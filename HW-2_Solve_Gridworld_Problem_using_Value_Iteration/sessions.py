@@ -0,0 +1,40 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class SessionStore:
+    """行程內的 session 儲存區
+
+    每個 session 有自己的狀態物件與鎖，同一個 session 的請求依序執行，
+    不同 session 之間可以平行處理。session 數量超過 max_sessions 時，
+    淘汰最久沒有使用的 session (LRU)。
+    """
+
+    def __init__(self, factory, max_sessions=1000):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self._entries = OrderedDict()  # session id -> (lock, state)
+        self._lock = threading.Lock()
+
+    def _entry(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                entry = self._entries[sid] = (threading.Lock(), self.factory())
+                while len(self._entries) > self.max_sessions:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(sid)
+            return entry
+
+    @contextmanager
+    def session(self, sid):
+        """取得 session 狀態並在 with 區塊內持有該 session 的鎖"""
+        lock, state = self._entry(sid)
+        with lock:
+            yield state
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
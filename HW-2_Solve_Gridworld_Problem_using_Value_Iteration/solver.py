@@ -0,0 +1,457 @@
+import heapq
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    import scipy.sparse as sp
+    from scipy.sparse.linalg import bicgstab, spsolve
+except ImportError:  # scipy 為選用套件，沒有安裝時只能使用迭代式政策評估
+    sp = None
+
+# 政策評估可選用的求解方法
+EVAL_SOLVERS = ("direct", "bicgstab", "iterative")
+
+# 價值迭代可選用的模式：同步 (Jacobi)、紅黑棋盤格就地更新 (Gauss-Seidel)、
+# 依與終點距離分層就地更新、政策迭代
+SOLVER_MODES = ("jacobi", "gauss_seidel", "distance", "policy_iteration")
+
+actions = ["↑", "↓", "←", "→"]
+
+# 每個動作的位移 (列, 行)，順序與 actions 相同
+MOVES = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+# 原本的迴圈以 max((value, arrow)) 選最佳動作，平手時比較箭頭字元，
+# 依 Unicode 大小排序為 ↓ > → > ↑ > ←，這裡保留相同的優先順序
+TIE_ORDER = np.array([1, 3, 0, 2], dtype=np.uint8)
+
+OBSTACLE_VALUE = -100  # 障礙物的顯示價值
+
+
+class GridSolver:
+    """向量化的價值迭代引擎
+
+    障礙物、終點與四個方向「能否移動」都預先存成布林遮罩，
+    每一輪更新只需少數幾個整個陣列的 NumPy 運算。
+    obstacles 可以是 (i, j) 的集合或 (n, n) 的布林陣列；大地圖可用 dtype=np.float32 減少一半記憶體，
+    並以 tile_rows 每次只更新幾列，讓 Q(s, a) 的暫存陣列只需 4 x (tile_rows + 2) x n 的大小。
+    """
+
+    def __init__(self, n, obstacles=(), end=None, gamma=0.9, theta=1e-3, dtype=np.float64, tile_rows=None):
+        self.n = n
+        self.end = tuple(end) if end else None
+        self.gamma = gamma
+        self.theta = theta
+        self.dtype = np.dtype(dtype)
+        self.tile_rows = min(tile_rows or n, n)
+
+        # 上一次收斂的價值函數，以及之後障礙物有變動、需要增量更新的格子
+        self.values = None
+        self.dirty = []
+
+        if isinstance(obstacles, np.ndarray):
+            self.obstacle_mask = np.array(obstacles, dtype=bool)
+        else:
+            self.obstacle_mask = np.zeros((n, n), dtype=bool)
+            for i, j in obstacles:
+                self.obstacle_mask[i, j] = True
+
+        self.terminal_mask = np.zeros((n, n), dtype=bool)
+        if end:
+            self.terminal_mask[end[0], end[1]] = True
+
+        # 需要更新的格子：不是障礙物也不是終點
+        self.active_mask = ~(self.obstacle_mask | self.terminal_mask)
+
+        # blocked[a, i, j] 為 True 表示在 (i, j) 做動作 a 會撞牆或撞到障礙物而留在原地
+        self.blocked = np.ones((4, n, n), dtype=bool)
+        free = ~self.obstacle_mask
+        self.blocked[0, 1:, :] = ~free[:-1, :]
+        self.blocked[1, :-1, :] = ~free[1:, :]
+        self.blocked[2, :, 1:] = ~free[:, :-1]
+        self.blocked[3, :, :-1] = ~free[:, 1:]
+
+        # 每個分塊上下各多一列鄰居
+        self._q = np.empty((4, min(self.tile_rows + 2, n), n), dtype=self.dtype)
+
+    def initial_values(self):
+        """與原本 value_iteration() 相同的初始價值：全部為 0，障礙物為 -100"""
+        values = np.zeros((self.n, self.n), dtype=self.dtype)
+        values[self.obstacle_mask] = OBSTACLE_VALUE
+        return values
+
+    def lower_bound_values(self):
+        """以永遠到不了終點的價值 -1 / (1 - γ) 作為初始值
+
+        這是所有價值的下界，更新時價值只會單調上升；依距離分層就地更新時，
+        可到達終點的格子在第一輪就會得到正確的價值。
+        """
+        values = self.initial_values()
+        values[self.active_mask] = -1 / (1 - self.gamma)
+        return values
+
+    def action_values(self, values, blocked=None, out=None):
+        """計算所有格子四個動作的價值 Q(s, a)，回傳 shape 為 (4, n, n) 的陣列
+
+        values 也可以是連續的幾列，此時 blocked 需傳入對應的列；out 為可重複使用的暫存陣列。
+        """
+        if blocked is None:
+            blocked = self.blocked
+        q = out if out is not None else np.empty((4,) + values.shape, dtype=values.dtype)
+        # 四個方向的鄰居視圖，撞牆或障礙物則以自身價值代替
+        q[:] = values
+        q[0, 1:, :] = values[:-1, :]
+        q[1, :-1, :] = values[1:, :]
+        q[2, :, 1:] = values[:, :-1]
+        q[3, :, :-1] = values[:, 1:]
+        np.copyto(q, values, where=blocked)
+        q *= self.gamma
+        q -= 1
+        return q
+
+    def backup(self, values):
+        """一次 Bellman 最佳化更新，回傳 (新價值, 最佳動作代碼)
+
+        每次處理 tile_rows 列，並帶上前後各一列作為鄰居；沒有設定 tile_rows 時整張地圖為一塊。
+        """
+        n, rows = self.n, self.tile_rows
+        new_values = np.empty_like(values)
+        best_action = np.empty((n, n), dtype=np.uint8)
+        for r0 in range(0, n, rows):
+            r1 = min(r0 + rows, n)
+            lo, hi = max(r0 - 1, 0), min(r1 + 1, n)
+            q = self.action_values(values[lo:hi], self.blocked[:, lo:hi], self._q[:, :hi - lo])
+            ordered = q[:, r0 - lo:r1 - lo][TIE_ORDER]
+            best_action[r0:r1] = TIE_ORDER[ordered.argmax(axis=0)]
+            new_values[r0:r1] = np.where(self.active_mask[r0:r1], ordered.max(axis=0), values[r0:r1])
+        return new_values, best_action
+
+    def value_iteration(self, values=None, progress=None):
+        """同步價值迭代直到收斂，回傳 (價值函數, 最佳動作代碼, 迭代次數)
+
+        動作代碼為 actions 的索引；障礙物與終點的代碼沒有意義，
+        呼叫端應保留原本的政策。progress(sweeps, delta, values) 會在每輪更新後被呼叫。
+        """
+        if values is None:
+            values = self.initial_values()
+
+        sweeps = 0
+        while True:
+            new_values, best_action = self.backup(values)
+            sweeps += 1
+            delta_value = np.max(np.abs(new_values - values), initial=0)
+            values = new_values
+            if progress is not None:
+                progress(sweeps, delta_value, values)
+            if delta_value < self.theta:
+                break
+
+        self.values = values
+        self.dirty = []
+        return values, best_action, sweeps
+
+    def set_obstacle(self, i, j, is_obstacle):
+        """切換單一格子的障礙物狀態，只更新受影響的遮罩，並記錄待增量更新的格子"""
+        n = self.n
+        self.obstacle_mask[i, j] = is_obstacle
+        self.active_mask[i, j] = not is_obstacle and not self.terminal_mask[i, j]
+        # 四個鄰居移入 (i, j) 的動作
+        if i < n-1: self.blocked[0, i+1, j] = is_obstacle
+        if i > 0: self.blocked[1, i-1, j] = is_obstacle
+        if j < n-1: self.blocked[2, i, j+1] = is_obstacle
+        if j > 0: self.blocked[3, i, j-1] = is_obstacle
+
+        if self.values is not None:
+            # 新障礙物直接設為 -100；移除的障礙物保留 -100，由 resolve() 從它的 Bellman 更新開始收斂
+            if is_obstacle:
+                self.values[i, j] = OBSTACLE_VALUE
+            self.dirty.append((i, j))
+
+    def _cell_backup(self, values, i, j):
+        """單一格子的 Bellman 最佳化更新值"""
+        best = -np.inf
+        for a in TIE_ORDER:
+            if self.blocked[a, i, j]:
+                v = values[i][j]
+            else:
+                di, dj = MOVES[a]
+                v = values[i + di][j + dj]
+            best = max(best, -1 + self.gamma * v)
+        return best
+
+    def resolve(self, progress=None, progress_every=1000):
+        """從上一次收斂的價值增量更新 (prioritized sweeping)
+
+        只把 dirty 格子及其鄰居放入以 Bellman 誤差為鍵的優先佇列，
+        每次更新誤差最大的格子並把可能受影響的鄰居重新排入，
+        當佇列中的誤差都小於 theta 時停止。回傳 (價值函數, 最佳動作代碼, 更新次數)。
+        progress(updates, max_error, None) 每 progress_every 次更新被呼叫一次。
+        """
+        if self.values is None:
+            return self.value_iteration(progress=progress)
+
+        n = self.n
+        # 以 Python list 做單格運算比逐一索引 NumPy 陣列快得多
+        values = self.values.tolist()
+        active = self.active_mask
+        heap = []
+
+        def push(i, j):
+            if 0 <= i < n and 0 <= j < n and active[i, j]:
+                error = abs(self._cell_backup(values, i, j) - values[i][j])
+                if error >= self.theta:
+                    heapq.heappush(heap, (-error, i, j))
+
+        for i, j in self.dirty:
+            push(i, j)
+            for di, dj in MOVES:
+                push(i + di, j + dj)
+
+        updates = 0
+        while heap:
+            _, i, j = heapq.heappop(heap)
+            new_value = self._cell_backup(values, i, j)
+            if abs(new_value - values[i][j]) < self.theta:
+                continue  # 已被其他更新處理過的過期項目
+            values[i][j] = new_value
+            updates += 1
+            if progress is not None and updates % progress_every == 0:
+                progress(updates, -heap[0][0] if heap else 0.0, None)
+            push(i, j)
+            for di, dj in MOVES:
+                push(i + di, j + dj)
+
+        self.values = np.array(values)
+        self.dirty = []
+        _, best_action = self.backup(self.values)
+        return self.values, best_action, updates
+
+    def solve(self, mode="jacobi", values=None, progress=None):
+        """以指定模式求解，回傳 (價值函數, 最佳動作代碼, 迭代次數)"""
+        if mode == "jacobi":
+            return self.value_iteration(values, progress)
+        if mode == "policy_iteration":
+            return self.policy_iteration(values, progress)
+        if mode == "gauss_seidel":
+            groups = self._checkerboard_groups(self.active_mask)
+        elif mode == "distance":
+            groups = self._distance_groups()
+        else:
+            raise ValueError(f"未知的求解模式: {mode}")
+        return self._in_place_sweeps(groups, values, progress)
+
+    def neighbor_index(self):
+        """每個格子四個動作到達的格子 (攤平索引)，撞牆或障礙物時為自己，shape 為 (4, n*n)"""
+        n = self.n
+        index = np.arange(n * n).reshape(n, n)
+        nbr = np.empty((4, n, n), dtype=np.intp)
+        nbr[:] = index
+        nbr[0, 1:, :] = index[:-1, :]
+        nbr[1, :-1, :] = index[1:, :]
+        nbr[2, :, 1:] = index[:, :-1]
+        nbr[3, :, :-1] = index[:, 1:]
+        np.copyto(nbr, index, where=self.blocked)
+        return nbr.reshape(4, -1)
+
+    def _checkerboard_groups(self, mask):
+        """把格子依 (i + j) 的奇偶分成紅黑兩組；同組格子互不相鄰，可以整組同時就地更新"""
+        rows, cols = np.indices(mask.shape)
+        parity = (rows + cols) % 2
+        return [np.flatnonzero(mask & (parity == p)) for p in (0, 1)]
+
+    def _distance_groups(self):
+        """從終點以 BFS 依距離分層，由近到遠排列；到不了終點的格子最後以紅黑兩組更新
+
+        相鄰格子的距離恰好差 1，所以同一層的格子互不相鄰。
+        """
+        nbr = self.neighbor_index()
+        distance = np.full(self.n * self.n, -1)
+        groups = []
+        if self.end:
+            frontier = np.array([self.end[0] * self.n + self.end[1]])
+            distance[frontier] = 0
+            while frontier.size:
+                layer = np.unique(nbr[:, frontier])
+                layer = layer[distance[layer] < 0]
+                distance[layer] = len(groups) + 1
+                if layer.size:
+                    groups.append(layer)
+                frontier = layer
+        unreachable = self.active_mask & (distance.reshape(self.n, self.n) < 0)
+        return groups + self._checkerboard_groups(unreachable)
+
+    def _in_place_sweeps(self, groups, values=None, progress=None):
+        """依 groups 的順序就地更新 (Gauss-Seidel)，後面的組直接使用前面剛更新的價值"""
+        if values is None:
+            values = self.lower_bound_values()
+        nbr = self.neighbor_index()[TIE_ORDER]
+        # 每組格子的鄰居索引只需取出一次
+        groups = [(cells, nbr[:, cells]) for cells in groups if cells.size]
+        flat = values.copy().ravel()
+
+        sweeps = 0
+        while True:
+            delta_value = 0.0
+            for cells, neighbors in groups:
+                q = self.gamma * flat[neighbors]
+                q -= 1
+                best_value = q.max(axis=0)
+                delta_value = max(delta_value, np.max(np.abs(best_value - flat[cells])))
+                flat[cells] = best_value
+            sweeps += 1
+            values = flat.reshape(self.n, self.n)
+            if progress is not None:
+                progress(sweeps, delta_value, values)
+            if delta_value < self.theta:
+                break
+
+        _, best_action = self.backup(values)
+        self.values = values
+        self.dirty = []
+        return values, best_action, sweeps
+
+    def policy_iteration(self, values=None, progress=None):
+        """政策迭代：以稀疏線性系統精確評估政策，再依評估結果貪婪改善，直到政策不再改變
+
+        只有嚴格更好的動作才會取代目前的動作，避免在價值相同的動作之間來回切換。
+        """
+        if values is None:
+            values = self.initial_values()
+        fixed_mask = ~self.active_mask
+        _, codes = self.backup(values)
+
+        iterations = 0
+        while True:
+            values = evaluate_policy_sparse(codes, values, fixed_mask, self.blocked, gamma=self.gamma)
+            iterations += 1
+
+            q = self.action_values(values)
+            current = np.take_along_axis(q, codes[None], axis=0)[0]
+            ordered = q[TIE_ORDER]
+            best_action = TIE_ORDER[ordered.argmax(axis=0)]
+            gain = np.where(self.active_mask, ordered.max(axis=0) - current, 0)
+            if progress is not None:
+                progress(iterations, gain.max(), values)
+            improve = gain > 1e-9
+            if not improve.any():
+                break
+            codes = np.where(improve, best_action, codes)
+
+        self.values = values
+        self.dirty = []
+        return values, codes, iterations
+
+    def apply_policy(self, policy, best_action):
+        """把動作代碼寫回箭頭政策 (list of lists)，障礙物與終點保持不變"""
+        arrows = np.array(actions)[best_action]
+        return np.where(self.active_mask, arrows, np.array(policy)).tolist()
+
+    def apply_codes(self, codes, best_action):
+        """與 apply_policy 相同，但政策為 uint8 動作代碼陣列"""
+        return np.where(self.active_mask, best_action, codes).astype(np.uint8)
+
+
+def sparse_available():
+    return sp is not None
+
+
+def boundary_blocked(n):
+    """只考慮地圖邊界的 blocked 遮罩：走出地圖的動作留在原地"""
+    blocked = np.zeros((4, n, n), dtype=bool)
+    blocked[0, 0, :] = True
+    blocked[1, -1, :] = True
+    blocked[2, :, 0] = True
+    blocked[3, :, -1] = True
+    return blocked
+
+
+def policy_codes(policy):
+    """把箭頭政策 (list of lists) 轉成動作代碼陣列"""
+    lookup = {arrow: code for code, arrow in enumerate(actions)}
+    return np.array([[lookup[a] for a in row] for row in policy], dtype=np.intp)
+
+
+def policy_arrows(codes):
+    """把動作代碼陣列轉回箭頭政策 (list of lists)"""
+    return np.array(actions)[codes].tolist()
+
+
+def transition_matrix(codes, blocked):
+    """確定性政策的轉移矩陣 P (CSR)，每一列只有一個 1，指向執行政策後到達的格子"""
+    n = codes.shape[0]
+    rows, cols = np.indices((n, n))
+    moves = np.array(MOVES)
+    stay = np.take_along_axis(blocked, codes[None], axis=0)[0]
+    ni = np.where(stay, rows, rows + moves[codes, 0])
+    nj = np.where(stay, cols, cols + moves[codes, 1])
+    size = n * n
+    return sp.csr_matrix((np.ones(size), (ni * n + nj).ravel(), np.arange(size + 1)), shape=(size, size))
+
+
+def evaluate_policy_sparse(codes, values, fixed_mask, blocked, gamma=0.9, method="direct"):
+    """以稀疏線性系統求解固定政策的 V(s)
+
+    非固定格子滿足 V = -1 + γPV，整理成 (I - γP_ff)V_f = -1 + γP_fx V_x，
+    其中 x 為價值保持不變的格子 (例如障礙物、起點、終點)。
+    method 為 "direct" 時以 spsolve 直接求解；為 "bicgstab" 時以目前的價值作為初始值迭代求解。
+    """
+    if not sparse_available():
+        raise ImportError("稀疏政策評估需要安裝 scipy")
+
+    n = codes.shape[0]
+    v = np.array(values, dtype=float).ravel()
+    free = np.flatnonzero(~fixed_mask)
+    fixed = np.flatnonzero(fixed_mask)
+    if free.size == 0:
+        return v.reshape(n, n)
+
+    P = transition_matrix(codes, blocked)[free]
+    A = sp.identity(free.size, format="csr") - gamma * P[:, free]
+    b = -1 + gamma * (P[:, fixed] @ v[fixed])
+
+    if method == "direct":
+        v[free] = spsolve(A.tocsc(), b)
+    elif method == "bicgstab":
+        x, info = bicgstab(A, b, x0=v[free], atol=1e-10)
+        if info != 0:
+            raise RuntimeError(f"bicgstab 未收斂 (info={info})")
+        v[free] = x
+    else:
+        raise ValueError(f"未知的求解方法: {method}")
+    return v.reshape(n, n)
+
+
+_profile_lock = threading.Lock()
+
+
+def solve_with_stats(solver, mode="jacobi", progress=None, profile=False):
+    """以指定模式求解並回傳 (價值函數, 最佳動作代碼, 統計資料)
+
+    統計資料包含模式、迭代次數與耗時；profile 為 True 時另以 tracemalloc 量測峰值記憶體，
+    由於 tracemalloc 是整個行程共用的，量測期間會與其他量測互斥。
+    """
+    stats = {"mode": mode}
+    if profile:
+        with _profile_lock:
+            was_tracing = tracemalloc.is_tracing()
+            if was_tracing:
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+            try:
+                t0 = time.perf_counter()
+                values, best_action, sweeps = solver.solve(mode, progress=progress)
+                elapsed = time.perf_counter() - t0
+                stats["peak_memory_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            finally:
+                if not was_tracing:
+                    tracemalloc.stop()
+    else:
+        t0 = time.perf_counter()
+        values, best_action, sweeps = solver.solve(mode, progress=progress)
+        elapsed = time.perf_counter() - t0
+    stats["sweeps"] = sweeps
+    stats["elapsed_ms"] = round(elapsed * 1000, 3)
+    return values, best_action, stats
@@ -0,0 +1,103 @@
+import numpy as np
+
+#Piece order matches Gridworld / render_np layers: Player, Goal, Pit, Wall
+PIECES = ['Player', 'Goal', 'Pit', 'Wall']
+PLAYER, GOAL, PIT, WALL = range(4)
+
+#Action indices follow the scripts' action maps {0:'u', 1:'d', 2:'l', 3:'r'}
+MOVES = np.array([(-1,0), (1,0), (0,-1), (0,1)])
+
+#Fixed layout of Gridworld.initGridStatic (row, column)
+STATIC_POSITIONS = np.array([(0,3), (0,0), (0,1), (1,1)])
+
+def valid_boards(pos, size):
+    """Vectorized Gridworld.validateBoard for a (M, 4, 2) batch of piece positions"""
+    #no two pieces on the same square
+    flat = np.sort(pos[:, :, 0] * size + pos[:, :, 1], axis=1)
+    distinct = (flat[:, 1:] != flat[:, :-1]).all(axis=1)
+
+    #validateBoard only ever matches the (0,0) corner; the other corners it lists are off the board
+    corner = (pos[:, [PLAYER, GOAL]] == 0).all(axis=2).any(axis=1)
+    stuck = ~(free_moves(pos, PLAYER, size) & free_moves(pos, GOAL, size))
+    return distinct & ~(corner & stuck)
+
+def free_moves(pos, piece, size):
+    #True where the piece has at least one move validateMove scores 0 (no wall, pit or edge)
+    new = pos[:, piece, None, :] + MOVES
+    inside = ((new >= 0) & (new < size)).all(axis=2)
+    on_wall = (new == pos[:, None, WALL]).all(axis=2)
+    on_pit = (new == pos[:, None, PIT]).all(axis=2)
+    return (inside & ~on_wall & ~on_pit).any(axis=1)
+
+def sample_boards(count, size, mode, rng=np.random):
+    """Sample count valid boards at once, returns (count, 4, 2) positions
+
+    'random' draws four distinct squares per board (the 4 smallest of one random key per square,
+    in key order), 'player' draws only the player; boards that fail validation are redrawn.
+    This gives the same distribution as the recursive initGridRand / initGridPlayer.
+    rng is a np.random.Generator or the np.random module. The shared pools draw from np.random a
+    whole batch at a time, so after np.random.seed call reset_pools() to reproduce the boards.
+    """
+    pos = np.broadcast_to(STATIC_POSITIONS, (count, 4, 2)).copy()
+    if mode == 'static':
+        return pos
+    pending = np.arange(count)
+    while pending.size:
+        if mode == 'player':
+            pos[pending, PLAYER] = (rng.random((pending.size, 2)) * size).astype(np.int64)
+        else:
+            keys = rng.random((pending.size, size * size))
+            cells = np.argpartition(keys, 4, axis=1)[:, :4]
+            order = np.argsort(np.take_along_axis(keys, cells, axis=1), axis=1)
+            cells = np.take_along_axis(cells, order, axis=1)
+            pos[pending] = np.stack(np.divmod(cells, size), axis=2)
+        pending = pending[~valid_boards(pos[pending], size)]
+    return pos
+
+class BoardPool:
+    """Ready-made valid boards, refilled a batch at a time; pop() is O(1) between refills"""
+
+    def __init__(self, size, mode='random', batch=4096, rng=np.random):
+        self.size = size
+        self.mode = mode
+        self.batch = batch
+        self.rng = rng
+        self._boards = np.empty((0, 4, 2), dtype=np.int64)
+        self._next = 0
+
+    def fill(self):
+        self._boards = sample_boards(self.batch, self.size, self.mode, self.rng)
+        self._next = 0
+
+    def pop(self):
+        if self._next >= len(self._boards):
+            self.fill()
+        board = self._boards[self._next]
+        self._next += 1
+        return board
+
+    def __len__(self):
+        return len(self._boards) - self._next
+
+_pools = {}
+
+def board_pool(size, mode):
+    """Shared pool per (size, mode), used by Gridworld's random and player initialization"""
+    key = (size, mode)
+    if key not in _pools:
+        _pools[key] = BoardPool(size, mode)
+    return _pools[key]
+
+def reset_pools():
+    """Drop all queued boards, so the next Gridworld() refills its pool from the current
+    np.random state; call it right after np.random.seed to make the board sequence follow the seed"""
+    _pools.clear()
+
+def pool_state():
+    """Boards still queued in every shared pool, so a checkpoint can resume the exact board sequence"""
+    return {key: (pool._boards.copy(), pool._next) for key, pool in _pools.items()}
+
+def set_pool_state(state):
+    for (size, mode), (boards, next_board) in state.items():
+        pool = board_pool(size, mode)
+        pool._boards, pool._next = boards.copy(), next_board
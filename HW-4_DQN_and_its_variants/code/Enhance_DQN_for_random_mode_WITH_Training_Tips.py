@@ -12,6 +12,7 @@ import numpy as np
 import random
 import matplotlib.pyplot as plt
 import tensorflow as tf
+import Profiler
 from Gridworld import Gridworld
 
 # === 1. 超參數 ===
@@ -26,6 +27,8 @@ MEM_SIZE     = 10000
 BATCH_SIZE   = 128
 EPISODES     = 2000
 MAX_STEPS    = 50
+USE_TF_DATA  = False          # True 時以 tf.data 在背景執行緒預先抽樣 batch
+N_STEP       = 1              # n-step return 的最大步數，1 即一般的一步 bootstrap
 
 # Learning rate schedule: 指數衰減
 lr_schedule = tf.keras.optimizers.schedules.ExponentialDecay(
@@ -59,27 +62,81 @@ class QNetwork(tf.keras.Model):
 
 # === 3. Experience Replay Buffer ===
 class ReplayBuffer:
-    def __init__(self, capacity):
-        self.buffer = []
+    """以預先配置的 NumPy 陣列實作的環形緩衝區
+
+    滿了之後直接覆寫最舊的位置 (O(1))，抽樣以一次產生的索引陣列取出整批。
+    狀態只有 0/1，以 uint8 存放，取出時再轉成 float32。
+    批次為 (s, a, r, s2, discount)，target = r + discount * max Q(s2)；n_step > 1 時
+    r 為往後最多 n_step 筆同一條軌跡的折扣獎勵總和，s2 為最後一筆的下一個狀態。
+    """
+    def __init__(self, capacity, n_step=N_STEP, gamma=GAMMA):
         self.capacity = capacity
+        self.n_step = n_step
+        self.gamma = gamma
+        self.s    = np.zeros((capacity, STATE_DIM), dtype=np.uint8)
+        self.s2   = np.zeros((capacity, STATE_DIM), dtype=np.uint8)
+        self.a    = np.zeros(capacity, dtype=np.int32)
+        self.r    = np.zeros(capacity, dtype=np.float32)
+        self.d    = np.zeros(capacity, dtype=np.float32)
+        self.pos  = 0
+        self.size = 0
 
     def push(self, s, a, r, s2, done):
-        if len(self.buffer) >= self.capacity:
-            self.buffer.pop(0)
-        # store state without extra batch dimension
-        self.buffer.append((s.squeeze(), a, r, s2.squeeze(), done))
+        i = self.pos
+        self.s[i], self.a[i], self.r[i], self.s2[i], self.d[i] = s.reshape(-1), a, r, s2.reshape(-1), done
+        self.pos  = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
 
     def sample(self, batch_size):
-        batch = random.sample(self.buffer, batch_size)
-        s, a, r, s2, d = map(np.array, zip(*batch))
-        return s.astype(np.float32), a, r.astype(np.float32), s2.astype(np.float32), d.astype(np.float32)
+        # 有放回抽樣
+        idx = np.random.randint(0, self.size, batch_size)
+        if self.n_step > 1:
+            r, last, steps = self.n_step_returns(idx)
+        else:
+            r, last, steps = self.r[idx], idx, 1
+        discount = (self.gamma ** steps * (1 - self.d[last])).astype(np.float32)
+        return self.s[idx].astype(np.float32), self.a[idx], r, self.s2[last].astype(np.float32), discount
+
+    def n_step_returns(self, idx):
+        """從 idx 往後最多 n_step 筆的折扣獎勵總和，回傳 (總和, 最後一筆的位置, 計入的筆數)
+
+        第 k 筆要計入，前一筆必須還沒結束、它的 s2 就是這一筆的 s (同一局，沒有因 MAX_STEPS 截斷)，
+        而且已經寫入；整批以 (B, n_step) 的索引矩陣一次算完。
+        """
+        steps = np.arange(self.n_step)
+        rows = (idx[:, None] + steps) % self.capacity
+        written = (self.pos - 1 - idx) % self.capacity   # idx 之後已寫入的筆數
+        linked = (self.s2[rows[:, :-1]] == self.s[rows[:, 1:]]).all(axis=2)
+        cont = linked & (self.d[rows[:, :-1]] == 0) & (steps[1:] <= written[:, None])
+        valid = np.concatenate([np.ones((len(idx), 1), dtype=bool), np.cumprod(cont, axis=1).astype(bool)], axis=1)
+        count = valid.sum(axis=1)
+        r = (self.r[rows] * self.gamma ** steps * valid).sum(axis=1).astype(np.float32)
+        return r, rows[np.arange(len(idx)), count - 1], count
+
+    def as_dataset(self, batch_size, prefetch=2):
+        """無限的 tf.data 批次串流，prefetch 讓抽樣在背景執行緒先做好
+
+        背景抽樣與 push 同時進行，取到的 batch 可能比最新寫入的經驗晚幾步。
+        """
+        def batches():
+            while True:
+                yield self.sample(batch_size)
+        signature = (
+            tf.TensorSpec((batch_size, STATE_DIM), tf.float32),
+            tf.TensorSpec((batch_size,), tf.int32),
+            tf.TensorSpec((batch_size,), tf.float32),
+            tf.TensorSpec((batch_size, STATE_DIM), tf.float32),
+            tf.TensorSpec((batch_size,), tf.float32),
+        )
+        return tf.data.Dataset.from_generator(batches, output_signature=signature).prefetch(prefetch)
 
     def __len__(self):
-        return len(self.buffer)
+        return self.size
 
 # === 4. 主訓練迴圈 ===
 agent = QNetwork()
 replay = ReplayBuffer(MEM_SIZE)
+batches = None   # USE_TF_DATA 時的批次迭代器，buffer 夠大後才建立
 eps = EPS_START
 
 # 用於記錄
@@ -88,46 +145,61 @@ all_losses  = []
 
 for ep in range(1, EPISODES+1):
     game = Gridworld(size=4, mode='random')
-    state = game.board.render_np().reshape(STATE_DIM).astype(np.float32)
+    state = game.board.render_np(dtype=np.float32).reshape(STATE_DIM)
     total_r = 0
 
     for step in range(MAX_STEPS):
         # ε-greedy
-        if random.random() < eps:
-            a = random.randint(0, ACTION_DIM-1)
-        else:
-            qvals = agent(state[None, :])  # [1,4]
-            a = int(tf.argmax(qvals[0]).numpy())
-
-        game.makeMove(action_map[a])
-        r = game.reward()
-        next_state = game.board.render_np().reshape(STATE_DIM).astype(np.float32)
+        with Profiler.phase("act"):
+            if random.random() < eps:
+                a = random.randint(0, ACTION_DIM-1)
+            else:
+                qvals = agent(state[None, :])  # [1,4]
+                a = int(tf.argmax(qvals[0]).numpy())
+
+        with Profiler.phase("env"):
+            game.makeMove(action_map[a])
+            r = game.reward()
+        with Profiler.phase("render"):
+            next_state = game.board.render_np(dtype=np.float32).reshape(STATE_DIM)
         done = abs(r)==10
 
         # 存入回放
-        replay.push(state, a, r, next_state, done)
+        with Profiler.phase("push"):
+            replay.push(state, a, r, next_state, done)
+        Profiler.count("env_steps")
         state = next_state
         total_r += r
 
         # 只有 buffer 滿了才開始更新
         if len(replay) >= BATCH_SIZE:
-            s_batch, a_batch, r_batch, s2_batch, d_batch = replay.sample(BATCH_SIZE)
-
-            with tf.GradientTape() as tape:
+            with Profiler.phase("sample"):
+                if USE_TF_DATA:
+                    if batches is None:
+                        batches = iter(replay.as_dataset(BATCH_SIZE))
+                    s_batch, a_batch, r_batch, s2_batch, disc_batch = next(batches)
+                else:
+                    s_batch, a_batch, r_batch, s2_batch, disc_batch = replay.sample(BATCH_SIZE)
+
+            # Keras 的前向傳播記錄在 tape 裡，反向傳播在 tape.gradient
+            with Profiler.phase("forward"), tf.GradientTape() as tape:
                 # 預測 Q(s,a)
                 q_pred = agent(s_batch)                   # [B,4]
-                idx    = tf.stack([tf.range(BATCH_SIZE, dtype=tf.int32), a_batch.astype(np.int32)], axis=1)
+                idx    = tf.stack([tf.range(BATCH_SIZE, dtype=tf.int32), tf.cast(a_batch, tf.int32)], axis=1)
                 q_sa   = tf.gather_nd(q_pred, idx)       # [B,]
 
                 # 計算 target Q
                 q_next = tf.reduce_max(agent(s2_batch), axis=1)  # [B,]
-                q_target = r_batch + GAMMA * q_next * (1 - d_batch)
+                q_target = r_batch + q_next * disc_batch
 
                 loss = mse_loss(q_target, q_sa)
 
-            grads = tape.gradient(loss, agent.trainable_variables)
-            optimizer.apply_gradients(zip(grads, agent.trainable_variables))
-            all_losses.append(float(loss.numpy()))
+            with Profiler.phase("backward"):
+                grads = tape.gradient(loss, agent.trainable_variables)
+            with Profiler.phase("optimizer"):
+                optimizer.apply_gradients(zip(grads, agent.trainable_variables))
+                all_losses.append(float(loss.numpy()))
+            Profiler.count("updates")
 
         if done:
             break
@@ -135,6 +207,7 @@ for ep in range(1, EPISODES+1):
     # ε 緩減
     eps = max(EPS_END, eps - EPS_DECAY)
     all_rewards.append(total_r)
+    Profiler.episode_end(ep)
 
     if ep % 100 == 0:
         print(f"Episode {ep:4d}, Reward: {total_r:.1f}, ε: {eps:.3f}")
@@ -156,9 +229,10 @@ plt.show()
 # === 6. 測試函式 ===
 def test_random(model, games=100):
     wins = 0
+    s = np.zeros(STATE_DIM, dtype=np.float32)  # 測試時不存回放，可重複使用同一個緩衝區
     for _ in range(games):
         game = Gridworld(size=4, mode='random')
-        s = game.board.render_np().reshape(STATE_DIM).astype(np.float32)
+        game.board.render_np(out=s)
         for _ in range(MAX_STEPS):
             q = model(s[None, :])
             a = int(tf.argmax(q[0]).numpy())
@@ -166,7 +240,7 @@ def test_random(model, games=100):
             if abs(game.reward())==10:
                 if game.reward()>0: wins+=1
                 break
-            s = game.board.render_np().reshape(STATE_DIM).astype(np.float32)
+            game.board.render_np(out=s)
     print(f"Win rate over {games} games: {wins/games*100:.1f}%")
 
 test_random(agent)
@@ -2,10 +2,17 @@ import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
+import copy
+import os
 import random
-from collections import deque
+import shutil
+import warnings
 import matplotlib.pyplot as plt
+import Profiler
+from BoardPool import pool_state, set_pool_state
 from Gridworld import Gridworld
+from StateTable import StateTable, observations, start_states
+from VecGridworld import VecGridworld
 
 # ———— 通用超参 ————
 SIZE       = 4
@@ -19,16 +26,39 @@ MEM_SIZE   = 2000
 BATCH_SIZE = 128
 MAX_EPISODES = 2000
 TARGET_SYNC_FREQ = 100  # Double DQN: 每 100 episodes 同步一次 target 网络
+# Prioritized replay: 优先级 = (|TD error| + eps)^alpha，IS 权重的 beta 随训练步数线性增加到 1
+PER_ALPHA      = 0.6
+PER_BETA_START = 0.4
+PER_BETA_STEPS = 5000
+PER_EPS        = 1e-3
+# 选动作用的推理副本：'trace' (torch.jit.trace)、'compile' (torch.compile) 或 'eager'；
+# 每 ACTOR_SYNC_FREQ 次更新从 online net 复制一次权重
+ACTOR_BACKEND   = 'trace'
+ACTOR_SYNC_FREQ = 1
+# learner：FUSED_FORWARD 时 s 与 s2 合并成一批只跑一次 online net (省下一次呼叫的开销，
+# 但反向传播要多算 s2 那一半)；Double DQN 的 target net 用上面同样的推理副本。
+# 每个环境步做 UPDATES_PER_STEP 次更新 (uniform replay 一次抽出整个超级批次再切开)
+FUSED_FORWARD    = torch.cuda.is_available()
+UPDATES_PER_STEP = 1
+# run_training 给定 checkpoint 目录时每 CHECKPOINT_EVERY 个 episode 存一次
+CHECKPOINT_EVERY = 100
+# N-step return：target = r_t + γ r_{t+1} + ... + γ^(m-1) r_{t+m-1} + γ^m max Q(s_{t+m})，m ≤ N_STEP
+N_STEP = 1
 
 ACTION_MAP = {0:'u',1:'d',2:'l',3:'r'}
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+def obs_dim():
+    """观测长度 4·SIZE·SIZE (render_np 的 4 个图层摊平)；SIZE 可在建立网络/agent 前修改"""
+    return 4 * SIZE * SIZE
+
 # ———— (A) 网络结构定义 ————
 
 class BasicDQN(nn.Module):
-    def __init__(self, in_dim=64, h1=150, h2=100, out_dim=4):
+    def __init__(self, in_dim=None, h1=150, h2=100, out_dim=4):
         super().__init__()
+        in_dim = in_dim or obs_dim()
         self.net = nn.Sequential(
             nn.Linear(in_dim, h1), nn.ReLU(),
             nn.Linear(h1,   h2), nn.ReLU(),
@@ -38,8 +68,9 @@ class BasicDQN(nn.Module):
         return self.net(x)
 
 class DuelingDQN(nn.Module):
-    def __init__(self, in_dim=64, h1=150, h2=100, out_dim=4):
+    def __init__(self, in_dim=None, h1=150, h2=100, out_dim=4):
         super().__init__()
+        in_dim = in_dim or obs_dim()
         # 共享前置层
         self.fc_shared = nn.Sequential(
             nn.Linear(in_dim, h1), nn.ReLU(),
@@ -63,69 +94,274 @@ class DuelingDQN(nn.Module):
 
 # ———— (B) 经验回放缓冲区 ————
 class ReplayBuffer:
-    def __init__(self, capacity):
-        self.buffer = deque(maxlen=capacity)
+    """预先配置的环形缓冲区
+
+    状态以 uint8 存放 (与 render_np 相同)，动作 int8、奖励 float32、done 为 bool，
+    每笔经验约 134 bytes；抽样时一次产生全部索引，再以 index_select 取出整批。
+    抽出的批次为 (s, a, r, s2, discount)，target = r + discount * Q(s2)；n_step > 1 时
+    r 与 s2 改为往后最多 n_step 笔同一条轨迹的折扣奖励总和与最后的下一个状态。
+    """
+    ARRAYS = ("s", "s2", "a", "r", "done")
+
+    def __init__(self, capacity, state_dim=None, n_step=1, gamma=GAMMA):
+        state_dim = state_dim or obs_dim()
+        self.capacity = capacity
+        self.n_step = n_step
+        self.gamma = gamma
+        self.s     = torch.zeros((capacity, state_dim), dtype=torch.uint8, device=device)
+        self.s2    = torch.zeros((capacity, state_dim), dtype=torch.uint8, device=device)
+        self.a     = torch.zeros(capacity, dtype=torch.int8, device=device)
+        self.r     = torch.zeros(capacity, dtype=torch.float32, device=device)
+        self.done  = torch.zeros(capacity, dtype=torch.bool, device=device)
+        self.pos   = 0   # 下一笔写入的位置
+        self.size  = 0
     def push(self, s, a, r, s2, done):
-        self.buffer.append((s, a, r, s2, done))
+        i = self.pos
+        self.s[i]  = torch.as_tensor(s).reshape(-1)    # 0/1 观测转成 uint8 不会失真
+        self.s2[i] = torch.as_tensor(s2).reshape(-1)
+        self.a[i], self.r[i], self.done[i] = a, r, done
+        self.pos  = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
     def sample(self, batch_size):
-        batch = random.sample(self.buffer, batch_size)
-        s, a, r, s2, done = zip(*batch)
+        # 有放回抽样，一次产生整批索引
+        return self.gather(torch.randint(self.size, (batch_size,), device=device))
+    def gather(self, idx):
+        if self.n_step > 1:
+            r, last, steps = self.n_step_returns(idx)
+        else:
+            r, last, steps = self.r.index_select(0, idx), idx, 1
         return (
-            torch.cat(s).to(device),
-            torch.tensor(a, dtype=torch.int64, device=device),
-            torch.tensor(r, dtype=torch.float32, device=device),
-            torch.cat(s2).to(device),
-            torch.tensor(done, dtype=torch.float32, device=device)
+            self.s.index_select(0, idx).float(),
+            self.a.index_select(0, idx).long(),
+            r,
+            self.s2.index_select(0, last).float(),
+            self.gamma ** steps * (1 - self.done.index_select(0, last).float())
         )
+    def n_step_returns(self, idx):
+        """从 idx 往后最多 n_step 笔的折扣奖励总和，回传 (总和, 最后一笔的位置, 计入的笔数)
+
+        第 k 笔要计入，前一笔必须还没结束、它的 s2 就是这一笔的 s (同一条轨迹)，
+        而且已经写入 (不超过最新的一笔)；整批以 (B, n_step) 的索引矩阵一次算完。
+        """
+        n = self.n_step
+        steps = torch.arange(n, device=idx.device)
+        rows = (idx[:, None] + steps) % self.capacity
+        written = (self.pos - 1 - idx) % self.capacity   # idx 之后已写入的笔数
+        linked = (self.s2[rows[:, :-1]] == self.s[rows[:, 1:]]).all(dim=2)
+        cont = linked & ~self.done[rows[:, :-1]] & (steps[1:] <= written[:, None])
+        valid = torch.cat([torch.ones_like(cont[:, :1]), cont.cumprod(dim=1).bool()], dim=1)
+        count = valid.sum(dim=1)
+        r = (self.r[rows] * self.gamma ** steps * valid).sum(dim=1)
+        last = rows.gather(1, (count - 1)[:, None]).squeeze(1)
+        return r, last, count
+    def save(self, directory):
+        """各数组写成 directory/<name>.npy，回传要另外保存的 pos/size"""
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, name + ".npy"), getattr(self, name).cpu().numpy())
+        return {"pos": self.pos, "size": self.size}
+    def load(self, directory, meta):
+        # 以 mmap 打开 .npy，直接复制进预先配置好的张量
+        for name in self.ARRAYS:
+            array = np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+            getattr(self, name).copy_(torch.from_numpy(np.array(array)))
+        self.pos, self.size = meta["pos"], meta["size"]
     def __len__(self):
-        return len(self.buffer)
+        return self.size
+
+
+class SumTree:
+    """以数组存放的完全二叉树，节点 k 的子节点为 2k、2k+1，叶子为各经验的优先级
+
+    批次抽样与更新都按层向量化，每次 O(log n)。
+    """
+    def __init__(self, capacity):
+        self.leaves = 1
+        while self.leaves < capacity:
+            self.leaves *= 2
+        self.tree = np.zeros(2 * self.leaves)
+    def total(self):
+        return self.tree[1]
+    def priorities(self, idx):
+        return self.tree[idx + self.leaves]
+    def update(self, idx, priorities):
+        node = np.asarray(idx) + self.leaves
+        self.tree[node] = priorities
+        # 由下往上重新加总受影响的父节点，重复的索引也不会重复累加
+        node = np.unique(node // 2)
+        while node[0] >= 1:
+            self.tree[node] = self.tree[2 * node] + self.tree[2 * node + 1]
+            node = np.unique(node // 2)
+    def find(self, values):
+        """找出前缀和落在 values 的叶子索引"""
+        node = np.ones(len(values), dtype=np.int64)
+        while node[0] < self.leaves:
+            left = 2 * node
+            # 浮点误差可能让值超过左子树，但不能走进总和为 0 的右子树
+            go_right = (values >= self.tree[left]) & (self.tree[left + 1] > 0)
+            values = values - np.where(go_right, self.tree[left], 0)
+            node = np.where(go_right, left + 1, left)
+        return node - self.leaves
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """按 TD error 优先抽样的环形缓冲区，新经验以目前最大的优先级写入"""
+    def __init__(self, capacity, state_dim=None, n_step=1, gamma=GAMMA, alpha=PER_ALPHA, eps=PER_EPS):
+        super().__init__(capacity, state_dim, n_step, gamma)
+        self.tree = SumTree(capacity)
+        self.alpha = alpha
+        self.eps = eps
+        self.max_priority = 1.0
+    def push(self, s, a, r, s2, done):
+        self.tree.update([self.pos], self.max_priority)
+        super().push(s, a, r, s2, done)
+    def sample(self, batch_size, beta=1.0):
+        # 分层抽样：把总优先级切成 batch_size 段，每段抽一个
+        total = self.tree.total()
+        values = (np.arange(batch_size) + np.random.random(batch_size)) * (total / batch_size)
+        idx = np.minimum(self.tree.find(values), self.size - 1)
+        # importance-sampling 权重 (N·P(i))^-beta，以最大值正规化
+        weights = (self.size * self.tree.priorities(idx) / total) ** (-beta)
+        weights /= weights.max()
+        batch = self.gather(torch.as_tensor(idx, device=device))
+        return batch + (torch.as_tensor(weights, dtype=torch.float32, device=device), idx)
+    def update_priorities(self, idx, td_errors):
+        priorities = (np.abs(td_errors) + self.eps) ** self.alpha
+        self.tree.update(idx, priorities)
+        self.max_priority = max(self.max_priority, priorities.max())
+    def save(self, directory):
+        np.save(os.path.join(directory, "tree.npy"), self.tree.tree)
+        return dict(super().save(directory), max_priority=self.max_priority)
+    def load(self, directory, meta):
+        super().load(directory, meta)
+        self.tree.tree[:] = np.load(os.path.join(directory, "tree.npy"), mmap_mode="r")
+        self.max_priority = meta["max_priority"]
 
 
 # ———— (C) Agent 基类 ————
 class DQNAgent:
-    def __init__(self, net, double=False):
+    def __init__(self, net, double=False, prioritized=False, n_step=None):
         self.net       = net.to(device)
-        self.target_net= net.__class__().to(device) if double else None
+        self.target_net= copy.deepcopy(net).to(device) if double else None
         if self.target_net:
             self.target_net.load_state_dict(self.net.state_dict())
+            self.target_net.eval().requires_grad_(False)
+            # 与 target_net 共用参数，sync_target 之后不必重建
+            self.target_forward = self._fast_forward(self.target_net)
         self.opt       = optim.Adam(self.net.parameters(), lr=LR)
-        self.replay    = ReplayBuffer(MEM_SIZE)
+        buffer_cls     = PrioritizedReplayBuffer if prioritized else ReplayBuffer
+        self.replay    = buffer_cls(MEM_SIZE, n_step=n_step or N_STEP)
+        self.prioritized = prioritized
         self.eps       = EPS_START
         self.double    = double
-        self.steps     = 0
+        self.steps     = 0     # 梯度更新次数
+        self.env_steps = 0     # run_training 走过的环境步数
+        self.actor     = self._make_actor(self.net)
+
+    def _make_actor(self, net):
+        """online net 的推理副本 (不计算梯度)，在同步点以 refresh_actor 更新权重"""
+        self.actor_net = copy.deepcopy(net).eval().requires_grad_(False)
+        return self._fast_forward(self.actor_net)
+
+    def _fast_forward(self, module):
+        if ACTOR_BACKEND == 'compile':
+            return torch.compile(module)
+        if ACTOR_BACKEND == 'trace':
+            # trace 出来的模块与 module 共用参数，之后只需复制权重、不必重新 trace
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                in_dim = next(m for m in module.modules() if isinstance(m, nn.Linear)).in_features
+                return torch.jit.trace(module, torch.zeros(1, in_dim, device=device))
+        return module
+
+    @torch.no_grad()
+    def refresh_actor(self):
+        # 直接逐个参数复制，比 load_state_dict 少掉建立/比对 state_dict 的开销
+        for p, q in zip(self.actor_net.parameters(), self.net.parameters()):
+            p.copy_(q)
+
+    def greedy(self, states):
+        """(N, obs_dim()) 状态 -> (N,) 贪婪动作"""
+        with torch.inference_mode():
+            return self.actor(states).argmax(dim=1)
 
     def select_action(self, state):
         # ε-greedy
         if random.random() < self.eps:
             return random.randrange(4)
         else:
-            with torch.no_grad():
-                q = self.net(state)
-                return q.argmax(dim=1).item()
+            return self.greedy(state).item()
+
+    def select_actions(self, states):
+        """一次为 N 个环境做 ε-greedy，回传 (N,) 动作张量"""
+        greedy = self.greedy(states)
+        explore = torch.rand(len(greedy), device=greedy.device) < self.eps
+        return torch.where(explore, torch.randint_like(greedy, 4), greedy)
 
-    def train_step(self):
+    def train_step(self, updates=None):
+        """做 updates (预设 UPDATES_PER_STEP) 次梯度更新，回传最后一次的 loss"""
         if len(self.replay) < BATCH_SIZE:
             return None
-        s, a, r, s2, done = self.replay.sample(BATCH_SIZE)
-        # 当前 Q(s,a)
-        q_vals = self.net(s).gather(1, a.unsqueeze(1)).squeeze()
-        # 计算 target Q
+        updates = updates or UPDATES_PER_STEP
+        if not self.prioritized:
+            # 一次抽出 updates 个 batch 再依序切开
+            with Profiler.phase("sample"):
+                batch = self.replay.sample(BATCH_SIZE * updates)
+            for k in range(updates):
+                loss = self.update(*(t[k * BATCH_SIZE:(k + 1) * BATCH_SIZE] for t in batch))
+            return loss
+        for _ in range(updates):
+            # 分层抽样的超级批次切开后每段只涵盖一部分优先级，所以 PER 每次更新重新抽样
+            beta = min(1.0, PER_BETA_START + self.steps * (1 - PER_BETA_START) / PER_BETA_STEPS)
+            with Profiler.phase("sample"):
+                batch = self.replay.sample(BATCH_SIZE, beta)
+            loss = self.update(*batch)
+        return loss
+
+    def q_values(self, s, s2):
+        """回传 (Q(s) 需要梯度, online net 的 Q(s2) 不需要梯度)"""
+        if FUSED_FORWARD:
+            q = self.net(torch.cat([s, s2]))
+            return q[:len(s)], q[len(s):].detach()
         with torch.no_grad():
-            if self.double:
-                # Double DQN: 选动作用 online net，评估用 target net
-                next_a = self.net(s2).argmax(dim=1, keepdim=True)
-                q_next = self.target_net(s2).gather(1, next_a).squeeze()
+            q_next = self.net(s2)
+        return self.net(s), q_next
+
+    @torch.no_grad()
+    def td_target(self, r, s2, discount, q_online_next):
+        # 计算 target Q
+        if self.double:
+            # Double DQN: 选动作用 online net，评估用 target net
+            next_a = q_online_next.argmax(dim=1, keepdim=True)
+            q_next = self.target_forward(s2).gather(1, next_a).squeeze()
+        else:
+            # Basic / Dueling 一般DQN
+            q_next = q_online_next.max(dim=1)[0]
+        return r + q_next * discount
+
+    def update(self, s, a, r, s2, discount, weights=None, idx=None):
+        with Profiler.phase("forward"):
+            q_all, q_online_next = self.q_values(s, s2)
+            # 当前 Q(s,a)
+            q_vals = q_all.gather(1, a.unsqueeze(1)).squeeze()
+            target = self.td_target(r, s2, discount, q_online_next)
+            if self.prioritized:
+                # 以 IS 权重修正抽样偏差，并用这批的 TD error 一次更新优先级
+                td = target - q_vals
+                loss = (weights * td.pow(2)).mean()
+                self.replay.update_priorities(idx, td.detach().abs().cpu().numpy())
             else:
-                # Basic / Dueling 一般DQN
-                q_next = self.net(s2).max(dim=1)[0]
-            target = r + GAMMA * q_next * (1 - done)
-        loss = nn.MSELoss()(q_vals, target)
+                loss = nn.MSELoss()(q_vals, target)
         # 反向传播
-        self.opt.zero_grad()
-        loss.backward()
-        self.opt.step()
+        with Profiler.phase("backward"):
+            self.opt.zero_grad()
+            loss.backward()
+        with Profiler.phase("optimizer"):
+            self.opt.step()
         # ε 线性衰减
         self.steps += 1
+        Profiler.count("updates")
+        if self.steps % ACTOR_SYNC_FREQ == 0:
+            self.refresh_actor()
         self.eps = max(EPS_END, EPS_START - self.steps / EPS_DECAY)
         return loss.item()
 
@@ -133,28 +369,107 @@ class DQNAgent:
         if self.target_net:
             self.target_net.load_state_dict(self.net.state_dict())
 
+    def save_checkpoint(self, directory, **extra):
+        """网络、optimizer、ε、步数、各 RNG 状态与 replay 一起存进 directory，extra 原样保存
+
+        先写到 directory.tmp 再换名，存到一半中断也不会破坏上一个检查点；
+        若中断在两次换名之间，上一个检查点留在 directory.old，由 latest_checkpoint 找回。
+        """
+        tmp, old = directory + ".tmp", directory + ".old"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        state = {
+            "net": self.net.state_dict(),
+            "target_net": self.target_net.state_dict() if self.target_net else None,
+            "opt": self.opt.state_dict(),
+            "eps": self.eps,
+            "steps": self.steps,
+            "env_steps": self.env_steps,
+            "replay": self.replay.save(tmp),
+            "rng": {
+                "python": random.getstate(),
+                "numpy": np.random.get_state(),
+                "torch": torch.get_rng_state(),
+                "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+            },
+            # Gridworld 的起始盘面从预先抽好的 pool 取出，剩下的盘面也要保存
+            "board_pools": pool_state(),
+            "extra": extra,
+        }
+        torch.save(state, os.path.join(tmp, "agent.pt"))
+        if os.path.exists(directory):
+            # 先清掉前一次中断留下的 .old，否则换名会因目录非空而失败
+            shutil.rmtree(old, ignore_errors=True)
+            os.replace(directory, old)
+        os.replace(tmp, directory)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def load_checkpoint(self, directory):
+        """还原 save_checkpoint 存下的状态 (agent 须以相同的网络与设定建立)，回传 extra"""
+        state = torch.load(os.path.join(directory, "agent.pt"), map_location=device, weights_only=False)
+        self.net.load_state_dict(state["net"])
+        if self.target_net:
+            self.target_net.load_state_dict(state["target_net"])
+        self.opt.load_state_dict(state["opt"])
+        self.eps, self.steps, self.env_steps = state["eps"], state["steps"], state["env_steps"]
+        self.replay.load(directory, state["replay"])
+        self.refresh_actor()
+        rng = state["rng"]
+        random.setstate(rng["python"])
+        np.random.set_state(rng["numpy"])
+        torch.set_rng_state(rng["torch"])
+        if rng["cuda"] is not None:
+            torch.cuda.set_rng_state_all(rng["cuda"])
+        set_pool_state(state["board_pools"])
+        return state["extra"]
+
 
 # ———— (D) 训练与比较 ————
 
-def run_training(agent, label):
+def latest_checkpoint(directory):
+    """回传可载入的检查点目录：directory，或换名中断时留下的 directory.old；都没有则回传 None"""
+    for path in (directory, directory + ".old"):
+        if os.path.exists(os.path.join(path, "agent.pt")):
+            return path
+    return None
+
+
+def run_training(agent, label, callback=None, checkpoint=None, checkpoint_every=CHECKPOINT_EVERY):
+    """callback(ep) 在每个 episode 结束后被调用，回传 True 时提前结束训练
+
+    给定 checkpoint 目录时每 checkpoint_every 个 episode 存一次检查点；目录里已有检查点时
+    先载入，从下一个 episode 接着训练，结果与不中断时完全相同。
+    """
     episode_rewards = []
     losses = []
-    for ep in range(1, MAX_EPISODES+1):
+    start = 1
+    resume = latest_checkpoint(checkpoint) if checkpoint is not None else None
+    if resume is not None:
+        extra = agent.load_checkpoint(resume)
+        episode_rewards, losses = extra["episode_rewards"], extra["losses"]
+        start = extra["episode"] + 1
+    for ep in range(start, MAX_EPISODES+1):
         game = Gridworld(size=SIZE, mode=MODE)
-        s = torch.from_numpy(game.board.render_np().reshape(1,64)).float().to(device)
+        s = torch.from_numpy(game.board.render_np(dtype=np.float32).reshape(1,-1)).to(device)
         total_r = 0
         done = False
         while not done:
-            a = agent.select_action(s)
-            game.makeMove(ACTION_MAP[a])
-            r = game.reward()
-            s2 = torch.from_numpy(game.board.render_np().reshape(1,64)).float().to(device)
+            with Profiler.phase("act"):
+                a = agent.select_action(s)
+            with Profiler.phase("env"):
+                game.makeMove(ACTION_MAP[a])
+                r = game.reward()
+            with Profiler.phase("render"):
+                s2 = torch.from_numpy(game.board.render_np(dtype=np.float32).reshape(1,-1)).to(device)
             done_flag = (abs(r) == 10)
-            agent.replay.push(s, a, r, s2, done_flag)
+            with Profiler.phase("push"):
+                agent.replay.push(s, a, r, s2, done_flag)
             loss = agent.train_step()
             if loss is not None:
                 losses.append(loss)
             total_r += r
+            agent.env_steps += 1
+            Profiler.count("env_steps")
             s = s2
             if done_flag:
                 break
@@ -162,9 +477,42 @@ def run_training(agent, label):
         # Double DQN 同步 target
         if agent.double and ep % TARGET_SYNC_FREQ == 0:
             agent.sync_target()
+        if checkpoint is not None and ep % checkpoint_every == 0:
+            with Profiler.phase("checkpoint"):
+                agent.save_checkpoint(checkpoint, episode=ep, episode_rewards=episode_rewards, losses=losses)
+        Profiler.episode_end(ep)
+        if callback is not None and callback(ep):
+            break
     return episode_rewards, losses
 
 
+def win_rate(agent, games=500, max_steps=50):
+    """以贪婪策略同时玩 games 局 (VecGridworld)，回传第一局就走到终点的比例"""
+    env = VecGridworld(games, size=SIZE, mode=MODE)
+    obs = env.render_np()
+    outcome = np.zeros(games, dtype=np.int64)   # 0 未结束, 1 赢, -1 输
+    agent.refresh_actor()
+    for _ in range(max_steps):
+        a = agent.greedy(torch.from_numpy(obs.reshape(games, -1)).float().to(device))
+        obs, r, done = env.step(a.cpu().numpy())
+        first = done & (outcome == 0)
+        outcome[first] = np.sign(r[first])
+        if (outcome != 0).all():
+            break
+    return (outcome == 1).mean()
+
+
+def q_error(agent):
+    """与查表算出的真实 Q* 比较：所有起始盘面上的平均 |Q - Q*| 与贪婪动作一致的比例"""
+    if SIZE != 4:
+        return None  # 查表只涵盖 4x4 棋盘
+    ids = start_states(MODE)
+    q_star = StateTable().optimal_q(gamma=GAMMA)[ids]
+    with torch.inference_mode():
+        q = agent.net(torch.from_numpy(observations(ids)).to(device)).cpu().numpy()
+    return np.abs(q - q_star).mean(), (q.argmax(1) == q_star.argmax(1)).mean()
+
+
 if __name__ == "__main__":
     # 1) Basic DQN
     basic_agent = DQNAgent(BasicDQN(), double=False)
@@ -178,6 +526,11 @@ if __name__ == "__main__":
     dueling_agent = DQNAgent(DuelingDQN(), double=False)
     r3, l3 = run_training(dueling_agent, "Dueling")
 
+    for label, agent in [("Basic", basic_agent), ("Double", double_agent), ("Dueling", dueling_agent)]:
+        err = q_error(agent)
+        if err is not None:
+            print(f"{label:8s} mean |Q - Q*| = {err[0]:.3f}, greedy action matches Q*: {err[1]*100:.1f}%")
+
     # ———— 绘图对比 ————
     plt.figure(figsize=(12,5))
     plt.subplot(1,2,1)
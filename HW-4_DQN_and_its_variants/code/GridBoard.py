@@ -32,24 +32,44 @@ class GridBoard:
         self.size = size #Board dimensions, e.g. 4 x 4
         self.components = {} #name : board piece
         self.masks = {}
+        self._render_out = None #last buffer passed to render_np(out=...)
+        self._occupied = None #combined boolean grid of all masks, rebuilt after addMask
+        self._mask_positions = None #cached set of (row, col) covered by any mask
 
     def addPiece(self, name, code, pos=(0,0)):
         newPiece = BoardPiece(name, code, pos)
         self.components[name] = newPiece
+        self._render_out = None
 
     #basically a set of boundary elements
     def addMask(self, name, mask, code):
         #mask is a 2D-numpy array with 1s where the boundary elements are
         newMask = BoardMask(name, mask, code)
         self.masks[name] = newMask
+        self._render_out = None #mask layers changed, redraw render_np buffers
+        self._occupied = None
+        self._mask_positions = None
+
+    #the caches assume a mask array is not modified after addMask; call addMask again to change it
+    def occupancy(self):
+        if self._occupied is None:
+            self._occupied = np.zeros((self.size, self.size), dtype=bool)
+            for mask in self.masks.values():
+                self._occupied |= np.asarray(mask.mask, dtype=bool)
+        return self._occupied
+
+    def mask_positions(self):
+        if self._mask_positions is None:
+            rows, cols = np.nonzero(self.occupancy())
+            self._mask_positions = set(zip(rows.tolist(), cols.tolist()))
+        return self._mask_positions
 
     def movePiece(self, name, pos):
-        move = True
-        for _, mask in self.masks.items():
-            if pos in zip_positions2d(mask.get_positions()):
-                move = False
-        if move:
-            self.components[name].pos = pos
+        #positions off the board never collide with a mask
+        row, col = pos
+        if self.masks and 0 <= row < self.size and 0 <= col < self.size and self.occupancy()[row, col]:
+            return
+        self.components[name].pos = pos
 
     def delPiece(self, name):
         del self.components['name']
@@ -67,22 +87,53 @@ class GridBoard:
 
         return displ_board
 
-    def render_np(self):
+    def render_np(self, out=None, dtype=np.uint8):
+        #out: preallocated C-contiguous buffer with num_pieces*size*size elements (any shape, e.g. (1,64));
+        #its dtype is used as is, so a float32 buffer skips the separate .astype
         num_pieces = len(self.components) + len(self.masks)
-        displ_board = np.zeros((num_pieces, self.size, self.size), dtype=np.uint8)
+        shape = (num_pieces, self.size, self.size)
+        if out is None:
+            displ_board = np.zeros(shape, dtype=dtype)
+            self._draw(displ_board)
+            return displ_board
+
+        if out.size != num_pieces * self.size * self.size or not out.flags.c_contiguous:
+            raise ValueError("out must be a C-contiguous array with %d elements" % (num_pieces * self.size * self.size))
+        displ_board = out.reshape(shape)
+        #when the same array object is passed again it still holds the previous frame, and only
+        #pieces that moved since then are redrawn; static layers (masks, pieces that did not move)
+        #are not rewritten, so the buffer must not be shared with another board or modified by the caller
+        if out is not self._render_out:
+            displ_board[:] = 0
+            self._drawn = self._draw(displ_board)
+            self._render_out = out
+            return out
+
+        for layer, piece in enumerate(self.components.values()):
+            drawn = self._drawn[layer]
+            if piece.pos != drawn:
+                displ_board[(layer,) + drawn] = 0
+                displ_board[(layer,) + piece.pos] = 1
+                self._drawn[layer] = piece.pos
+        return out
+
+    def _draw(self, displ_board):
+        #returns the piece positions that were drawn, one per component layer
         layer = 0
+        drawn = []
         for name, piece in self.components.items():
             pos = (layer,) + piece.pos
             displ_board[pos] = 1
+            drawn.append(piece.pos)
             layer += 1
 
         for name, mask in self.masks.items():
-            x,y = self.masks['boundary'].get_positions()
+            x,y = mask.get_positions()
             z = np.repeat(layer,len(x))
             a = (z,x,y)
             displ_board[a] = 1
             layer += 1
-        return displ_board
+        return drawn
 
 def addTuple(a,b):
     return tuple([sum(x) for x in zip(a,b)])
@@ -1,4 +1,6 @@
 from GridBoard import *
+from BoardPool import PIECES, board_pool
+from StateTable import encode
 
 class Gridworld:
 
@@ -59,26 +61,16 @@ class Gridworld:
 
     #Initialize player in random location, but keep wall, goal and pit stationary
     def initGridPlayer(self):
-        #height x width x depth (number of pieces)
-        self.initGridStatic()
-        #place player
-        self.board.components['Player'].pos = randPair(0,self.board.size)
-
-        if (not self.validateBoard()):
-            #print('Invalid grid. Rebuilding..')
-            self.initGridPlayer()
+        self.placePieces(board_pool(self.board.size, 'player').pop())
 
     #Initialize grid so that goal, pit, wall, player are all randomly placed
     def initGridRand(self):
-        #height x width x depth (number of pieces)
-        self.board.components['Player'].pos = randPair(0,self.board.size)
-        self.board.components['Goal'].pos = randPair(0,self.board.size)
-        self.board.components['Pit'].pos = randPair(0,self.board.size)
-        self.board.components['Wall'].pos = randPair(0,self.board.size)
-
-        if (not self.validateBoard()):
-            #print('Invalid grid. Rebuilding..')
-            self.initGridRand()
+        self.placePieces(board_pool(self.board.size, 'random').pop())
+
+    #Boards come pre-validated from a pool filled by batched rejection sampling (see BoardPool)
+    def placePieces(self, positions):
+        for name, (row, col) in zip(PIECES, positions):
+            self.board.components[name].pos = (int(row), int(col))
 
     def validateMove(self, piece, addpos=(0,0)):
         outcome = 0 #0 is valid, 1 invalid, 2 lost game
@@ -123,5 +115,9 @@ class Gridworld:
         else:
             return -1
 
+    #16-bit id of a 4x4 board (see StateTable), e.g. to look up ground-truth Q-values
+    def stateId(self):
+        return int(encode(np.array([self.board.components[name].pos for name in PIECES])))
+
     def display(self):
         return self.board.render()
@@ -10,6 +10,7 @@ import numpy as np
 import torch
 import random
 import matplotlib.pyplot as plt
+import Profiler
 from Gridworld import Gridworld
 
 # 1. 超參數
@@ -42,22 +43,27 @@ for ep in range(epochs):
     done = False
 
     while not done:
-        # 1) 選動作
-        qvals = model(state)
-        if random.random() < epsilon:
-            a = random.randint(0,3)
-        else:
-            a = torch.argmax(qvals).item()
+        # 1) 選動作 (只需推論，不建立計算圖)
+        with Profiler.phase("act"):
+            if random.random() < epsilon:
+                a = random.randint(0,3)
+            else:
+                with torch.inference_mode():
+                    a = torch.argmax(model(state)).item()
 
         # 2) 執行動作
-        game.makeMove(action_set[a])
-        next_np = game.board.render_np().reshape(1,64) + np.random.rand(1,64)*0.1
-        next_s  = torch.from_numpy(next_np).float()
-        r = game.reward()
-
-        # 3) 計算 target Q 值 (先轉成 Python float)
-        with torch.no_grad():
-            max_next_q = model(next_s).max().item()
+        with Profiler.phase("env"):
+            game.makeMove(action_set[a])
+            r = game.reward()
+        with Profiler.phase("render"):
+            next_np = game.board.render_np().reshape(1,64) + np.random.rand(1,64)*0.1
+            next_s  = torch.from_numpy(next_np).float()
+
+        # 3) state 與 next_s 疊成一批做一次前向傳播：第 0 列用來算 loss，
+        #    第 1 列只取最大值當 target (轉成 Python float，不會回傳梯度)
+        with Profiler.phase("forward"):
+            qvals, qnext = model(torch.cat([state, next_s]))
+            max_next_q = qnext.max().item()
         # 這裡用 abs(r)!=1 判斷是否為 terminal (r=10或-10)
         if abs(r) != 1:
             target_val = float(r)             # terminal: Q_target = r
@@ -68,19 +74,24 @@ for ep in range(epochs):
         y = torch.tensor(target_val, dtype=torch.float32)
 
         # 5) 取出本網路對 a 的預測 Q(s,a)
-        x = qvals.squeeze()[a]  # shape=[]，也是 float32
+        x = qvals[a]  # shape=[]，也是 float32
 
         # 6) 計算並回傳梯度
         loss = loss_fn(x, y)
-        optimizer.zero_grad()
-        loss.backward()
-        optimizer.step()
+        with Profiler.phase("backward"):
+            optimizer.zero_grad()
+            loss.backward()
+        with Profiler.phase("optimizer"):
+            optimizer.step()
+        Profiler.count("env_steps")
+        Profiler.count("updates")
 
         state = next_s
         if abs(r) == 10:  # r=+10 或 -10 結束
             done = True
 
     losses.append(loss.item())
+    Profiler.episode_end(ep + 1)
     # ε-greedy 漸減
     if epsilon > 0.1:
         epsilon -= 1.0/epochs
@@ -97,11 +108,12 @@ plt.show()
 # 6. 測試函式
 def test_static(model, max_steps=20):
     game = Gridworld(size=4, mode='static')
-    s_np = game.board.render_np().reshape(1,64)
-    s = torch.from_numpy(s_np).float()
+    # s 與 s_np 共用記憶體，render_np(out=) 每步只改寫移動過的格子
+    s_np = game.board.render_np(out=np.zeros((1,64), dtype=np.float32))
+    s = torch.from_numpy(s_np)
     for step in range(max_steps):
-        q = model(s)
-        a = torch.argmax(q).item()
+        with torch.inference_mode():
+            a = torch.argmax(model(s)).item()
         game.makeMove(action_set[a])
         print(f"Step {step:2d}: move {action_set[a]}")
         print(game.display())
@@ -109,7 +121,7 @@ def test_static(model, max_steps=20):
         if abs(r)==10:
             print("→ 遊戲結束，Reward =", r)
             return r>0
-        s = torch.from_numpy(game.board.render_np().reshape(1,64)).float()
+        game.board.render_np(out=s_np)
     print("→ 超過最大步數，視為失敗")
     return False
 
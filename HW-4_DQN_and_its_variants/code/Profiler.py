@@ -0,0 +1,163 @@
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+
+#Phase timers for the training loops. Disabled by default: phase() then returns one shared
+#no-op context manager, so an instrumented loop only pays a function call per phase.
+#
+#Enable from the environment before starting a script, e.g.
+#   DQN_PROFILE="every=100,window=2000,chrome=trace.json,torch=torch_trace.json"
+#or call configure(...) from code. Keys:
+#   every   print rolling percentiles every N episodes (0 = never)
+#   window  number of most recent samples per phase the percentiles are taken over
+#   chrome  write every phase as a Chrome trace (chrome://tracing, Perfetto) to this path at exit
+#   torch   also run torch.profiler and export its Chrome trace to this path at exit;
+#           phases show up in it as record_function ranges
+ENV_VAR = "DQN_PROFILE"
+MAX_EVENTS = 1000000   #Chrome trace events kept in memory; later events are counted but dropped
+
+_NULL = contextlib.nullcontext()
+_active = None
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start", "range")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.range = None
+
+    def __enter__(self):
+        if self.profiler.torch_profile is not None:
+            import torch
+            self.range = torch.profiler.record_function(self.name)
+            self.range.__enter__()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        if self.range is not None:
+            self.range.__exit__(*exc)
+        self.profiler.record(self.name, self.start, end - self.start)
+        return False
+
+class Profiler:
+    def __init__(self, every=100, window=2000, chrome=None, torch=None):
+        self.every = every
+        self.chrome = chrome
+        self.torch_path = torch
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self.totals = defaultdict(int)      #ns per phase since the last report
+        self.counters = defaultdict(int)
+        self.events = []
+        self.dropped = 0
+        self.pid = os.getpid()
+        self.origin = time.perf_counter_ns()
+        self.last_report = self.origin
+        self.torch_profile = None
+        if torch:
+            import torch as _torch
+            self.torch_profile = _torch.profiler.profile(activities=[_torch.profiler.ProfilerActivity.CPU])
+            self.torch_profile.start()
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def record(self, name, start, duration):
+        self.samples[name].append(duration)
+        self.totals[name] += duration
+        if self.chrome:
+            if len(self.events) < MAX_EVENTS:
+                self.events.append((name, start, duration, threading.get_ident()))
+            else:
+                self.dropped += 1
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def episode_end(self, ep):
+        if self.every and ep % self.every == 0:
+            print(self.report(ep))
+
+    def report(self, ep=None):
+        """Rolling p50/p90/p99 per phase (microseconds) and each phase's share of the wall time"""
+        now = time.perf_counter_ns()
+        wall = max(now - self.last_report, 1)
+        lines = ["[profile]" + ("" if ep is None else " episode %d" % ep)
+                 + "  %-14s %8s %9s %9s %9s %7s" % ("phase", "samples", "p50 us", "p90 us", "p99 us", "share")]
+        for name, samples in sorted(self.samples.items(), key=lambda kv: -self.totals[kv[0]]):
+            p50, p90, p99 = np.percentile(np.fromiter(samples, dtype=np.int64, count=len(samples)), [50, 90, 99]) / 1e3
+            lines.append("           %-14s %8d %9.1f %9.1f %9.1f %6.1f%%"
+                         % (name, len(samples), p50, p90, p99, 100.0 * self.totals[name] / wall))
+        if self.counters:
+            lines.append("           " + "  ".join("%s=%d" % kv for kv in sorted(self.counters.items())))
+        self.totals.clear()
+        self.last_report = now
+        return "\n".join(lines)
+
+    def close(self):
+        if self.torch_profile is not None:
+            self.torch_profile.stop()
+            self.torch_profile.export_chrome_trace(self.torch_path)
+            self.torch_profile = None
+        if self.chrome:
+            events = [{"name": name, "ph": "X", "pid": self.pid, "tid": tid,
+                       "ts": (start - self.origin) / 1e3, "dur": duration / 1e3}
+                      for name, start, duration, tid in self.events]
+            with open(self.chrome, "w") as f:
+                json.dump({"traceEvents": events, "otherData": {"dropped_events": self.dropped}}, f)
+            self.events = []
+
+def configure(enabled=True, **options):
+    """Turn profiling on with Profiler(**options), or off with enabled=False; returns the active profiler"""
+    global _active
+    if _active is not None:
+        _active.close()
+    _active = Profiler(**options) if enabled else None
+    return _active
+
+def active():
+    return _active
+
+def phase(name):
+    """with phase('render'): ... -- times the block when profiling is enabled"""
+    if _active is None:
+        return _NULL
+    return _active.phase(name)
+
+def count(name, n=1):
+    if _active is not None:
+        _active.count(name, n)
+
+def episode_end(ep):
+    if _active is not None:
+        _active.episode_end(ep)
+
+def close():
+    if _active is not None:
+        _active.close()
+
+def _from_env():
+    spec = os.environ.get(ENV_VAR, "").strip()
+    if not spec or spec == "0":
+        return
+    options = {}
+    for item in spec.split(","):
+        key, _, value = item.partition("=")
+        if key in ("every", "window"):
+            options[key] = int(value)
+        elif key in ("chrome", "torch"):
+            options[key] = value
+        elif key not in ("1", "on"):
+            raise ValueError("unknown %s option %r" % (ENV_VAR, key))
+    configure(**options)
+
+_from_env()
+atexit.register(close)
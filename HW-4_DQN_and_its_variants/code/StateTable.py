@@ -0,0 +1,103 @@
+import os
+import tempfile
+
+import numpy as np
+from BoardPool import MOVES, PIT, GOAL, PLAYER, WALL, sample_boards, valid_boards
+
+#4x4 board: each piece position is a square index row*4+col (4 bits), so a whole
+#Player/Goal/Pit/Wall placement packs into 16 bits: player<<12 | goal<<8 | pit<<4 | wall
+SIZE = 4
+NUM_STATES = 1 << 16
+SHIFTS = np.array([12, 8, 4, 0])
+
+TABLE_DIR = os.environ.get("GRIDWORLD_TABLE_DIR", os.path.join(tempfile.gettempdir(), "gridworld_tables"))
+
+def encode(pos):
+    """(..., 4, 2) piece positions -> uint16 state ids"""
+    squares = pos[..., 0] * SIZE + pos[..., 1]
+    return (squares << SHIFTS).sum(axis=-1).astype(np.uint16)
+
+def decode(ids):
+    """uint16 state ids -> (..., 4, 2) piece positions"""
+    squares = (np.asarray(ids, dtype=np.int64)[..., None] >> SHIFTS) & 0xF
+    return np.stack(np.divmod(squares, SIZE), axis=-1)
+
+def build_table():
+    """Step every state with every action, using the same rules as Gridworld.makeMove / reward
+
+    Returns next_state (65536, 4) uint16, reward (65536, 4) int8 and terminal (65536,) bool.
+    States where the player already sits on the goal or pit are terminal and step to themselves
+    with reward 0. Ids with overlapping pieces are filled in too but never occur in play.
+    """
+    ids = np.arange(NUM_STATES)
+    pos = decode(ids)
+    terminal = (pos[:, PLAYER] == pos[:, GOAL]).all(axis=1) | (pos[:, PLAYER] == pos[:, PIT]).all(axis=1)
+
+    next_state = np.empty((NUM_STATES, 4), dtype=np.uint16)
+    reward = np.empty((NUM_STATES, 4), dtype=np.int8)
+    for a, move in enumerate(MOVES):
+        new = pos[:, PLAYER] + move
+        inside = ((new >= 0) & (new < SIZE)).all(axis=1)
+        on_wall = (new == pos[:, WALL]).all(axis=1)
+        player = np.where((inside & ~on_wall)[:, None], new, pos[:, PLAYER])
+        moved = ids & 0x0FFF | (player[:, 0] * SIZE + player[:, 1]) << 12
+
+        r = np.full(NUM_STATES, -1, dtype=np.int8)
+        r[(player == pos[:, GOAL]).all(axis=1)] = 10
+        r[(player == pos[:, PIT]).all(axis=1)] = -10
+        next_state[:, a] = np.where(terminal, ids, moved)
+        reward[:, a] = np.where(terminal, 0, r)
+    return next_state, reward, terminal
+
+class StateTable:
+    """Precomputed 4x4 transition table, built once and memory-mapped from TABLE_DIR"""
+
+    NAMES = ("next_state", "reward", "terminal")
+
+    def __init__(self, directory=TABLE_DIR):
+        self.directory = directory
+        paths = [os.path.join(directory, "gridworld4x4.%s.npy" % name) for name in self.NAMES]
+        if not all(os.path.exists(p) for p in paths):
+            os.makedirs(directory, exist_ok=True)
+            for path, array in zip(paths, build_table()):
+                #write to a temporary file first so concurrent loaders never see a partial table
+                tmp = path + ".%d.tmp.npy" % os.getpid()
+                np.save(tmp, array)
+                os.replace(tmp, path)
+        self.next_state, self.reward, self.terminal = (np.load(p, mmap_mode='r') for p in paths)
+
+    def step(self, ids, actions):
+        """Table-driven step for arrays of state ids and action indices: (next ids, rewards, dones)"""
+        new = self.next_state[ids, actions]
+        return new, self.reward[ids, actions], self.terminal[new]
+
+    def optimal_q(self, gamma=0.9, tol=1e-10):
+        """Ground-truth Q*(s, a) by value iteration over the table, shape (65536, 4) float64"""
+        next_state = np.asarray(self.next_state)
+        reward = np.asarray(self.reward, dtype=np.float64)
+        terminal = np.asarray(self.terminal)
+        q = np.zeros((NUM_STATES, 4))
+        while True:
+            v = np.where(terminal, 0.0, q.max(axis=1))
+            new_q = np.where(terminal[:, None], 0.0, reward + gamma * v[next_state])
+            if np.max(np.abs(new_q - q)) < tol:
+                return new_q
+            q = new_q
+
+def start_states(mode):
+    """Ids of every board Gridworld(size=4, mode) can start from"""
+    if mode == 'static':
+        return encode(sample_boards(1, SIZE, 'static'))
+    ids = np.arange(NUM_STATES, dtype=np.uint16)
+    pos = decode(ids)
+    keep = valid_boards(pos, SIZE)
+    if mode == 'player':
+        keep &= (ids & 0x0FFF) == (encode(sample_boards(1, SIZE, 'static'))[0] & 0x0FFF)
+    return ids[keep]
+
+def observations(ids):
+    """(N, 64) float32 observations for state ids, laid out like GridBoard.render_np().reshape(1,64)"""
+    pos = decode(ids)
+    obs = np.zeros((len(pos), 4, SIZE, SIZE), dtype=np.float32)
+    obs[np.arange(len(pos))[:, None], np.arange(4), pos[:, :, 0], pos[:, :, 1]] = 1
+    return obs.reshape(len(pos), -1)
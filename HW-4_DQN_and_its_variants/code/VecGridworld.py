@@ -0,0 +1,90 @@
+import numpy as np
+from BoardPool import GOAL, MOVES, PIT, PLAYER, WALL, sample_boards
+from StateTable import encode
+
+class VecGridworld:
+    """N Gridworld games stepped together with NumPy array operations.
+
+    Piece positions live in a (N, 4, 2) integer array instead of BoardPiece objects.
+    Moves, rewards and board validation follow Gridworld exactly; finished games
+    (reward +10 / -10, or max_steps reached) are reset automatically.
+    With a StateTable (4x4 only) the games are also tracked as 16-bit state ids in self.ids
+    and stepped with table lookups instead of move arithmetic.
+    """
+
+    def __init__(self, num_envs, size=4, mode='static', max_steps=None, seed=None, table=None):
+        if size < 4:
+            print("Minimum board size is 4. Initialized to size 4.")
+            size = 4
+        self.num_envs = num_envs
+        self.size = size
+        self.mode = mode
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+        if table is not None and size != 4:
+            raise ValueError("StateTable only covers the 4x4 board")
+        self.table = table
+
+        self.pos = np.zeros((num_envs, 4, 2), dtype=np.int64)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        self.ids = np.zeros(num_envs, dtype=np.uint16)
+        self.final_obs = np.zeros((num_envs, 4, size, size), dtype=np.uint8)
+        self._envs = np.arange(num_envs)
+        self.reset()
+
+    def reset(self, mask=None):
+        """Re-initialize the games selected by the boolean mask (all by default), return observations"""
+        self._reset(self._envs if mask is None else np.flatnonzero(mask))
+        return self.render_np()
+
+    def _reset(self, idx):
+        if idx.size:
+            self.pos[idx] = sample_boards(idx.size, self.size, self.mode, self.rng)
+            if self.table is not None:
+                self.ids[idx] = encode(self.pos[idx])
+            self.steps[idx] = 0
+
+    def step(self, actions):
+        """Apply one action per game, return (observations, rewards, dones)
+
+        Games that ended are reset before the observations are rendered; their
+        last observation before the reset is kept in final_obs.
+        """
+        if self.table is not None:
+            self.ids, rewards, dones = self.table.step(self.ids, actions)
+            #only the player moves; its square is the top 4 bits of the id
+            self.pos[:, PLAYER] = np.stack(np.divmod(self.ids >> 12, self.size), axis=1)
+        else:
+            player = self.pos[:, PLAYER]
+            new = player + MOVES[actions]
+            #makeMove: moves into walls or off the board are ignored, moves into the pit are allowed
+            inside = ((new >= 0) & (new < self.size)).all(axis=1)
+            on_wall = (new == self.pos[:, WALL]).all(axis=1)
+            move = inside & ~on_wall
+            player[move] = new[move]
+
+            rewards = np.full(self.num_envs, -1, dtype=np.int64)
+            rewards[(player == self.pos[:, GOAL]).all(axis=1)] = 10
+            rewards[(player == self.pos[:, PIT]).all(axis=1)] = -10
+            dones = rewards != -1
+        self.steps += 1
+
+        finished = dones.copy()
+        if self.max_steps is not None:
+            finished |= self.steps >= self.max_steps
+        if finished.any():
+            idx = np.flatnonzero(finished)
+            self.final_obs[idx] = self._render(idx)
+            self._reset(idx)
+        return self.render_np(), rewards, dones
+
+    def _render(self, idx):
+        obs = np.zeros((idx.size, 4, self.size, self.size), dtype=np.uint8)
+        rows = np.arange(idx.size)[:, None]
+        pos = self.pos[idx]
+        obs[rows, np.arange(4), pos[:, :, 0], pos[:, :, 1]] = 1
+        return obs
+
+    def render_np(self):
+        """(N, 4, size, size) uint8 observations, the batched equivalent of GridBoard.render_np"""
+        return self._render(self._envs)
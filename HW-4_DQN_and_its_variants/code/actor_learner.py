@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+actor_learner.py
+
+以多個行程訓練 Enhanced_DQN_Variants_for_player_mode 的 DQNAgent：
+- actor 行程各自以 VecGridworld 同時玩 --envs-per-actor 局，用 ε-greedy 選動作，
+  把經驗整批寫進共享記憶體中的 replay；
+- learner (主行程) 從同一個 replay 抽樣做梯度更新，每 --publish-every 次更新
+  把權重複製到共享的網路參數，actor 看到版本號改變時再載入。
+ε 依 learner 的更新次數照 DQNAgent 的線性衰減計算；Double DQN 每完成
+TARGET_SYNC_FREQ 個 episode 同步一次 target 網路，與 run_training 相同。
+
+依序以 --actors 指定的 actor 數各訓練 --seconds 秒，輸出每秒環境步數與每秒更新次數。
+只支援 uniform replay (sum-tree 留在 learner 行程內無法共享)，且 N_STEP 必須為 1。
+
+用法：python actor_learner.py --actors 1 2 4 8 --seconds 30 --double
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+import Enhanced_DQN_Variants_for_player_mode as dqn
+from BoardPool import reset_pools
+from VecGridworld import VecGridworld
+
+# actor 統計欄位：環境步數、完成的 episode 數、贏的局數
+ENV_STEPS, EPISODES, WINS = range(3)
+
+
+class SharedReplayBuffer(dqn.ReplayBuffer):
+    """放在共享記憶體的環形 replay，寫入位置為共享計數器，讀寫以同一把鎖保護
+
+    不支援 n-step return：各 actor、各局的經驗交錯寫入，相鄰的列不是同一條軌跡。
+    """
+    def __init__(self, capacity, lock, state_dim=None, n_step=1):
+        if n_step > 1:
+            raise ValueError("SharedReplayBuffer does not support n_step > 1 (actor transitions are interleaved)")
+        super().__init__(capacity, state_dim)
+        for t in (self.s, self.s2, self.a, self.r, self.done):
+            t.share_memory_()
+        self.written = torch.zeros((), dtype=torch.int64).share_memory_()   # 累計寫入筆數
+        self.lock = lock
+    def push(self, s, a, r, s2, done):
+        self.push_batch(torch.as_tensor(s).reshape(1, -1), torch.as_tensor([a]), torch.as_tensor([r]),
+                        torch.as_tensor(s2).reshape(1, -1), torch.as_tensor([done]))
+    def push_batch(self, s, a, r, s2, done):
+        """一次寫入 n 筆經驗，超過結尾時繞回開頭"""
+        n = len(s)
+        with self.lock:
+            idx = (int(self.written) + torch.arange(n)) % self.capacity
+            self.s[idx], self.s2[idx] = s.to(torch.uint8), s2.to(torch.uint8)
+            self.a[idx], self.r[idx], self.done[idx] = a.to(torch.int8), r.float(), done.bool()
+            self.written += n
+    def sample(self, batch_size):
+        with self.lock:
+            return self.gather(torch.randint(len(self), (batch_size,)))
+    def __len__(self):
+        return min(int(self.written), self.capacity)
+
+
+def actor(rank, args, net_cls, shared_net, version, weights_lock, learner_steps, replay, stats, stop):
+    torch.set_num_threads(1)
+    torch.manual_seed(args.seed + rank)
+    dqn.MODE = args.mode   # spawn 出來的行程重新匯入模組，要再設定一次
+    n = args.envs_per_actor
+    net = net_cls().eval().requires_grad_(False)
+    seen = -1
+    env = VecGridworld(n, size=dqn.SIZE, mode=dqn.MODE, max_steps=args.max_steps, seed=args.seed + rank)
+    obs = torch.from_numpy(env.render_np().reshape(n, -1))
+    while not stop.is_set():
+        if int(version) != seen:
+            with weights_lock:
+                net.load_state_dict(shared_net.state_dict())
+                seen = int(version)
+        eps = max(dqn.EPS_END, dqn.EPS_START - int(learner_steps) / dqn.EPS_DECAY)
+        with torch.inference_mode():
+            greedy = net(obs.float()).argmax(dim=1)
+        a = torch.where(torch.rand(n) < eps, torch.randint(4, (n,)), greedy)
+        nxt, r, done = env.step(a.numpy())
+        # 結束 (或超過 max_steps) 的局已被重置，真正的下一個狀態在 final_obs
+        finished = env.steps == 0
+        s2 = nxt.reshape(n, -1).copy()
+        s2[finished] = env.final_obs[finished].reshape(-1, s2.shape[1])
+        replay.push_batch(obs, a, torch.from_numpy(r), torch.from_numpy(s2), torch.from_numpy(done))
+        stats[rank] += torch.tensor([n, int(finished.sum()), int((r == 10).sum())])
+        obs = torch.from_numpy(nxt.reshape(n, -1))
+
+
+def train(num_actors, args):
+    """訓練 args.seconds 秒，回傳 (agent, 統計結果)"""
+    ctx = mp.get_context("spawn")
+    net_cls = dqn.DuelingDQN if args.dueling else dqn.BasicDQN
+    agent = dqn.DQNAgent(net_cls(), double=args.double)
+    agent.replay = SharedReplayBuffer(args.memory, ctx.Lock(), n_step=agent.replay.n_step)
+    shared_net = net_cls().share_memory()
+    shared_net.load_state_dict(agent.net.state_dict())
+    version = torch.zeros((), dtype=torch.int64).share_memory_()
+    learner_steps = torch.zeros((), dtype=torch.int64).share_memory_()
+    stats = torch.zeros((num_actors, 3), dtype=torch.int64).share_memory_()
+    weights_lock, stop = ctx.Lock(), ctx.Event()
+
+    procs = [ctx.Process(target=actor, args=(rank, args, net_cls, shared_net, version, weights_lock,
+                                             learner_steps, agent.replay, stats, stop), daemon=True)
+             for rank in range(num_actors)]
+    for p in procs:
+        p.start()
+    # 等到 replay 足夠一個 batch 才開始計時，不把行程啟動時間算進吞吐量
+    while len(agent.replay) < dqn.BATCH_SIZE:
+        time.sleep(0.01)
+    steps0 = int(stats[:, ENV_STEPS].sum())
+    synced_episodes = 0
+    t0 = time.perf_counter()
+    try:
+        while time.perf_counter() - t0 < args.seconds:
+            agent.train_step()
+            learner_steps.fill_(agent.steps)
+            if agent.steps % args.publish_every == 0:
+                with weights_lock:
+                    shared_net.load_state_dict(agent.net.state_dict())
+                    version += 1
+            episodes = int(stats[:, EPISODES].sum())
+            if agent.double and episodes - synced_episodes >= dqn.TARGET_SYNC_FREQ:
+                agent.sync_target()
+                synced_episodes = episodes
+    finally:
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        for p in procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+    total = stats.sum(dim=0)
+    return agent, {
+        "env_steps_per_s": (int(total[ENV_STEPS]) - steps0) / elapsed,
+        "updates_per_s": agent.steps / elapsed,
+        "episodes": int(total[EPISODES]),
+        "train_win_rate": int(total[WINS]) / max(1, int(total[EPISODES])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--actors", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=30.0, help="每種 actor 數的訓練時間")
+    parser.add_argument("--envs-per-actor", type=int, default=16)
+    parser.add_argument("--max-steps", type=int, default=50, help="每局最多步數，超過即重新開局")
+    parser.add_argument("--memory", type=int, default=50000, help="共享 replay 容量")
+    parser.add_argument("--publish-every", type=int, default=50, help="每幾次更新發佈一次權重給 actor")
+    parser.add_argument("--learner-threads", type=int, default=1)
+    parser.add_argument("--mode", default=dqn.MODE, choices=["static", "player", "random"])
+    parser.add_argument("--double", action="store_true")
+    parser.add_argument("--dueling", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    dqn.MODE = args.mode
+    torch.set_num_threads(args.learner_threads)
+
+    print(f"{'actors':>6} {'env steps/s':>12} {'updates/s':>10} {'episodes':>9} {'train win':>10} {'eval win':>9}")
+    for num_actors in args.actors:
+        torch.manual_seed(args.seed)
+        np.random.seed(args.seed)
+        reset_pools()
+        agent, result = train(num_actors, args)
+        print(f"{num_actors:>6} {result['env_steps_per_s']:>12.0f} {result['updates_per_s']:>10.0f} "
+              f"{result['episodes']:>9} {result['train_win_rate']:>10.2f} {dqn.win_rate(agent):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
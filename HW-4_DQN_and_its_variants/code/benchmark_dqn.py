@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+benchmark_dqn.py
+
+以固定的 seed 比較 Basic / Double / Dueling DQN (Enhanced_DQN_Variants_for_player_mode)，
+涵蓋 --modes 指定的 Gridworld 模式與 --sizes 指定的棋盤大小。每個組合在獨立的行程中訓練
+(--jobs 個行程平行執行)，每隔 --eval-every 個 episode 以 win_rate 評估一次，達到 --target 即停止。
+
+每個組合記錄：每秒環境步數、每秒更新次數、達到目標勝率的 episode 數 / 環境步數 / 秒數
+(評估時間不計入)、最後一次評估的勝率與行程的峰值 RSS。結果寫成 --csv 與 --json；
+給定 --baseline (先前版本的 JSON) 時，列出每秒環境步數下降超過 --tolerance 的組合。
+
+用法：python benchmark_dqn.py --seeds 0 1 2 --modes static player --sizes 4 --jobs 4 \
+          --csv results.csv --json results.json --baseline previous.json
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing as mp
+import platform
+import random
+import resource
+import sys
+import time
+import traceback
+
+import numpy as np
+import torch
+
+import Enhanced_DQN_Variants_for_player_mode as dqn
+from BoardPool import reset_pools
+
+VARIANTS = ("Basic", "Double", "Dueling")
+FIELDS = ["variant", "mode", "size", "seed", "episodes", "env_steps", "updates", "seconds",
+          "env_steps_per_s", "updates_per_s", "win_rate", "target_episodes", "target_env_steps",
+          "target_seconds", "peak_rss_mb", "error"]
+
+
+def make_agent(variant):
+    net = dqn.DuelingDQN() if variant == "Dueling" else dqn.BasicDQN()
+    return dqn.DQNAgent(net, double=variant == "Double")
+
+
+def run_job(job):
+    """在子行程中訓練一個 (variant, mode, size, seed) 組合，回傳一列結果
+
+    訓練失敗時回傳只有組合與 error 欄位的一列，其他組合的結果照常保留。
+    """
+    variant, mode, size, seed, args = job
+    try:
+        return train_job(variant, mode, size, seed, args)
+    except Exception as exc:
+        traceback.print_exc()
+        return {"variant": variant, "mode": mode, "size": size, "seed": seed, "error": repr(exc)}
+
+
+def train_job(variant, mode, size, seed, args):
+    torch.set_num_threads(1)
+    dqn.MODE, dqn.SIZE, dqn.MAX_EPISODES = mode, size, args.episodes
+    random.seed(seed)
+    np.random.seed(seed)
+    reset_pools()
+    torch.manual_seed(seed)
+    agent = make_agent(variant)
+    row = {"variant": variant, "mode": mode, "size": size, "seed": seed, "win_rate": 0.0,
+           "target_episodes": None, "target_env_steps": None, "target_seconds": None, "error": None}
+    episodes = 0
+    eval_time = 0.0
+    t0 = time.perf_counter()
+
+    def callback(ep):
+        nonlocal episodes, eval_time
+        episodes = ep
+        if ep % args.eval_every:
+            return False
+        t_eval = time.perf_counter()
+        row["win_rate"] = float(dqn.win_rate(agent, games=args.eval_games))
+        eval_time += time.perf_counter() - t_eval
+        if row["win_rate"] >= args.target and row["target_episodes"] is None:
+            row["target_episodes"] = ep
+            row["target_env_steps"] = agent.env_steps
+            row["target_seconds"] = round(time.perf_counter() - t0 - eval_time, 3)
+            return not args.full
+        return False
+
+    dqn.run_training(agent, variant, callback=callback)
+    seconds = time.perf_counter() - t0 - eval_time
+    row.update({
+        "episodes": episodes,
+        "env_steps": agent.env_steps,
+        "updates": agent.steps,
+        "seconds": round(seconds, 3),
+        "env_steps_per_s": round(agent.env_steps / seconds, 1),
+        "updates_per_s": round(agent.steps / seconds, 1),
+        # Linux 的 ru_maxrss 單位為 KB；每個組合各用一個新行程，峰值不會互相累加
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
+    return row
+
+
+def regressions(rows, baseline_path, tolerance):
+    """與先前的 JSON 結果比較，回傳每秒環境步數下降超過 tolerance 的 (key, 舊值, 新值)"""
+    with open(baseline_path) as f:
+        old = {(r["variant"], r["mode"], r["size"], r["seed"]): r for r in json.load(f)["results"]}
+    slower = []
+    for r in rows:
+        key = (r["variant"], r["mode"], r["size"], r["seed"])
+        if r["error"] or key in old and old[key].get("error"):
+            continue
+        if key in old and r["env_steps_per_s"] < old[key]["env_steps_per_s"] * (1 - tolerance):
+            slower.append((key, old[key]["env_steps_per_s"], r["env_steps_per_s"]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--modes", nargs="+", default=[dqn.MODE], choices=["static", "player", "random"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[dqn.SIZE])
+    parser.add_argument("--target", type=float, default=0.9, help="目標勝率")
+    parser.add_argument("--eval-every", type=int, default=50)
+    parser.add_argument("--eval-games", type=int, default=500)
+    parser.add_argument("--episodes", type=int, default=dqn.MAX_EPISODES, help="每個組合最多訓練的 episode 數")
+    parser.add_argument("--full", action="store_true", help="達到目標勝率後仍訓練到 --episodes")
+    parser.add_argument("--jobs", type=int, default=mp.cpu_count(), help="平行的行程數")
+    parser.add_argument("--csv", help="CSV 輸出路徑")
+    parser.add_argument("--json", help="JSON 輸出路徑")
+    parser.add_argument("--baseline", help="先前版本的 JSON 結果，用來找出變慢的組合")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="每秒環境步數可容許的下降比例")
+    args = parser.parse_args()
+    if min(args.sizes) < 4:
+        parser.error("Gridworld 的棋盤大小至少為 4")
+
+    jobs = [(v, m, n, s, args) for v, m, n, s in itertools.product(args.variants, args.modes, args.sizes, args.seeds)]
+    # spawn 加上每個組合一個新行程：不繼承主行程的 torch 執行緒狀態，峰值 RSS 也各自獨立
+    with mp.get_context("spawn").Pool(args.jobs, maxtasksperchild=1) as pool:
+        rows = pool.map(run_job, jobs, chunksize=1)
+
+    print(f"{'variant':>8} {'mode':>7} {'size':>4} {'seed':>4} {'steps/s':>8} {'updates/s':>9} "
+          f"{'win rate':>8} {'to target':>10} {'RSS MB':>7}")
+    for r in rows:
+        if r["error"]:
+            print(f"{r['variant']:>8} {r['mode']:>7} {r['size']:>4} {r['seed']:>4}  failed: {r['error']}")
+            continue
+        to_target = f"{r['target_seconds']:.1f}s" if r["target_seconds"] is not None else "-"
+        print(f"{r['variant']:>8} {r['mode']:>7} {r['size']:>4} {r['seed']:>4} {r['env_steps_per_s']:>8.0f} "
+              f"{r['updates_per_s']:>9.0f} {r['win_rate']:>8.2f} {to_target:>10} {r['peak_rss_mb']:>7.1f}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS, restval="")
+            writer.writeheader()
+            writer.writerows(rows)
+    if args.json:
+        meta = {"python": platform.python_version(), "torch": torch.__version__, "numpy": np.__version__,
+                "platform": platform.platform(), "cpus": mp.cpu_count(), "device": str(dqn.device),
+                "args": {k: v for k, v in vars(args).items() if k not in ("csv", "json", "baseline")}}
+        with open(args.json, "w") as f:
+            json.dump({"meta": meta, "results": rows}, f, indent=2)
+    if args.baseline:
+        slower = regressions(rows, args.baseline, args.tolerance)
+        for key, old, new in slower:
+            print(f"slower: {key} {old:.0f} -> {new:.0f} steps/s")
+        if slower:
+            sys.exit(1)
+    if any(r["error"] for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+benchmark_gridboard.py
+
+比較 GridBoard.movePiece 原本逐一掃描遮罩座標串列的做法與目前以布林佔用格查表的做法，
+在不同棋盤大小下每次移動的耗時；查表版本的耗時應不隨 size 增加。
+
+用法：python benchmark_gridboard.py --sizes 4 16 64 256 --moves 20000
+"""
+
+import argparse
+import time
+
+import numpy as np
+from GridBoard import GridBoard, zip_positions2d
+
+
+def scan_move(board, name, pos):
+    """原本的 movePiece：每次移動都對每個遮罩做 np.nonzero 並線性搜尋"""
+    move = True
+    for _, mask in board.masks.items():
+        if pos in zip_positions2d(mask.get_positions()):
+            move = False
+    if move:
+        board.components[name].pos = pos
+
+
+def make_board(size, rng):
+    board = GridBoard(size=size)
+    board.addPiece('Player', 'P', (0, 0))
+    # 外圍一圈牆加上約 10% 的隨機障礙
+    boundary = np.zeros((size, size), dtype=np.uint8)
+    boundary[[0, -1], :] = 1
+    boundary[:, [0, -1]] = 1
+    board.addMask('boundary', boundary, '#')
+    board.addMask('rocks', (rng.random((size, size)) < 0.1).astype(np.uint8), 'o')
+    return board
+
+
+def per_move_us(move, board, targets):
+    t0 = time.perf_counter()
+    for pos in targets:
+        move(board, 'Player', pos)
+    return (time.perf_counter() - t0) / len(targets) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 16, 64, 256])
+    parser.add_argument("--moves", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'size':>6} {'scan (us)':>12} {'lookup (us)':>13} {'match':>7}")
+    for size in args.sizes:
+        targets = [tuple(int(v) for v in p) for p in rng.integers(0, size, (args.moves, 2))]
+        # 較大的棋盤逐一掃描太慢，只取部分移動量測
+        scan_targets = targets[:max(100, args.moves * 16 // size ** 2)]
+
+        board_scan = make_board(size, rng)
+        board_lookup = GridBoard(size=size)
+        board_lookup.addPiece('Player', 'P', (0, 0))
+        for name, mask in board_scan.masks.items():
+            board_lookup.addMask(name, mask.mask, mask.code)
+
+        t_scan = per_move_us(scan_move, board_scan, scan_targets)
+        t_lookup = per_move_us(GridBoard.movePiece, board_lookup, targets)
+
+        # 以相同的移動序列確認兩種做法的結果一致
+        board_scan.components['Player'].pos = board_lookup.components['Player'].pos = (0, 0)
+        match = True
+        for pos in scan_targets:
+            scan_move(board_scan, 'Player', pos)
+            board_lookup.movePiece('Player', pos)
+            match &= board_scan.components['Player'].pos == board_lookup.components['Player'].pos
+        print(f"{size:>6} {t_scan:>12.2f} {t_lookup:>13.2f} {str(match):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+benchmark_learner.py
+
+比較 DQNAgent 的 learner 每秒更新次數：
+- baseline：Q(s)、online Q(s2)、target Q(s2) 各跑一次前向傳播，target net 為一般模組；
+- separate：同上，但 target net 改用 trace 出來的推理副本；
+- fused   ：s 與 s2 合併成一批只跑一次 online net，target net 同樣用 trace 的副本；
+separate 與 fused 再以 --updates 指定的每步更新次數從超級批次連續更新。
+replay 先以隨機盤面填滿，只量測 train_step 本身。同時檢查合併與分開算出的 TD target 完全相同。
+
+用法：python benchmark_learner.py --steps 2000 --updates 1 4
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+import Enhanced_DQN_Variants_for_player_mode as dqn
+from StateTable import NUM_STATES, observations
+
+VARIANTS = {
+    "Basic":   (dqn.BasicDQN, False),
+    "Double":  (dqn.BasicDQN, True),
+    "Dueling": (dqn.DuelingDQN, False),
+}
+
+
+def make_agent(variant, fused, backend, seed):
+    dqn.FUSED_FORWARD = fused
+    dqn.ACTOR_BACKEND = backend
+    torch.manual_seed(seed)
+    net_cls, double = VARIANTS[variant]
+    agent = dqn.DQNAgent(net_cls(), double=double)
+    rng = np.random.default_rng(seed)
+    for _ in range(dqn.MEM_SIZE):
+        s, s2 = observations(rng.integers(NUM_STATES, size=2))
+        agent.replay.push(s, int(rng.integers(4)), float(rng.choice([-1, -10, 10])), s2, bool(rng.random() < 0.1))
+    return agent
+
+
+def targets_match(agent, batches=20):
+    """同一批資料分別以合併與分開的前向傳播計算 TD target，回傳是否逐位元相同"""
+    for _ in range(batches):
+        s, a, r, s2, discount = agent.replay.sample(dqn.BATCH_SIZE)
+        dqn.FUSED_FORWARD = True
+        fused = agent.td_target(r, s2, discount, agent.q_values(s, s2)[1])
+        dqn.FUSED_FORWARD = False
+        separate = agent.td_target(r, s2, discount, agent.q_values(s, s2)[1])
+        if agent.double:
+            # 分開的版本以原本的 target net 模組評估
+            with torch.no_grad():
+                next_a = agent.net(s2).argmax(dim=1, keepdim=True)
+                q_next = agent.target_net(s2).gather(1, next_a).squeeze()
+            separate = r + q_next * discount
+        if not torch.equal(fused, separate):
+            return False
+    return True
+
+
+def updates_per_second(agent, steps, updates):
+    agent.train_step(updates)  # 暖身 (trace 後第一次呼叫較慢)
+    t0 = time.perf_counter()
+    for _ in range(steps):
+        agent.train_step(updates)
+    return steps * updates / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--steps", type=int, default=2000, help="呼叫 train_step 的次數")
+    parser.add_argument("--updates", type=int, nargs="+", default=[1, 4], help="每步的更新次數")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'variant':>8} {'learner':>12} {'updates/s':>10} {'speedup':>8} {'targets equal':>14}")
+    for variant in args.variants:
+        base = updates_per_second(make_agent(variant, False, "eager", args.seed), args.steps, 1)
+        print(f"{variant:>8} {'baseline':>12} {base:>10.0f} {1.0:>8.2f} {'':>14}")
+        for fused in (False, True):
+            for updates in args.updates:
+                agent = make_agent(variant, fused, "trace", args.seed)
+                rate = updates_per_second(agent, args.steps, updates)
+                same = targets_match(agent)
+                label = f"{'fused' if fused else 'separate'} x{updates}"
+                print(f"{variant:>8} {label:>12} {rate:>10.0f} {rate / base:>8.2f} {str(same):>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+benchmark_replay.py
+
+比較 uniform replay 與 prioritized replay (sum-tree)，以及 --n-steps 指定的 n-step return，
+在 player (或 --mode 指定的) 模式下達到目標勝率所需的實際訓練時間與 episode 數。
+每隔 --eval-every 個 episode 以 500 局貪婪策略評估一次勝率，達到 --target 即停止。
+
+用法：python benchmark_replay.py --target 0.9 --seeds 0 1 2 --double
+      python benchmark_replay.py --replay uniform --n-steps 1 3 5 --mode random
+"""
+
+import argparse
+import itertools
+import random
+import time
+
+import numpy as np
+import torch
+
+import Enhanced_DQN_Variants_for_player_mode as dqn
+from BoardPool import reset_pools
+
+
+def time_to_win_rate(prioritized, n_step, seed, args):
+    random.seed(seed)
+    np.random.seed(seed)
+    reset_pools()   # 不沿用前一次訓練剩下的盤面，每個 seed 的盤面序列才固定
+    torch.manual_seed(seed)
+    agent = dqn.DQNAgent(dqn.DuelingDQN() if args.dueling else dqn.BasicDQN(),
+                         double=args.double, prioritized=prioritized, n_step=n_step)
+    result = {"episodes": None, "seconds": None, "win_rate": 0.0}
+    t0 = time.perf_counter()
+    eval_time = 0.0
+
+    def callback(ep):
+        nonlocal eval_time
+        if ep % args.eval_every:
+            return False
+        t_eval = time.perf_counter()
+        rate = dqn.win_rate(agent)
+        eval_time += time.perf_counter() - t_eval
+        result["win_rate"] = rate
+        if rate >= args.target:
+            # 評估本身的時間不算在訓練時間內
+            result["episodes"] = ep
+            result["seconds"] = time.perf_counter() - t0 - eval_time
+            return True
+        return False
+
+    dqn.run_training(agent, "PER" if prioritized else "uniform", callback=callback)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", type=float, default=0.9, help="目標勝率")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--eval-every", type=int, default=50)
+    parser.add_argument("--episodes", type=int, default=dqn.MAX_EPISODES, help="每次訓練的最大 episode 數")
+    parser.add_argument("--mode", default=dqn.MODE, choices=["static", "player", "random"])
+    parser.add_argument("--replay", nargs="+", default=["uniform", "PER"], choices=["uniform", "PER"])
+    parser.add_argument("--n-steps", type=int, nargs="+", default=[dqn.N_STEP], help="n-step return 的步數")
+    parser.add_argument("--double", action="store_true")
+    parser.add_argument("--dueling", action="store_true")
+    args = parser.parse_args()
+    dqn.MAX_EPISODES = args.episodes
+    dqn.MODE = args.mode
+
+    print(f"{'replay':>12} {'seed':>5} {'episodes':>9} {'seconds':>9} {'win rate':>9}")
+    for replay, n_step in itertools.product(args.replay, args.n_steps):
+        label = replay if n_step == 1 else f"{replay} n={n_step}"
+        times = []
+        for seed in args.seeds:
+            result = time_to_win_rate(replay == "PER", n_step, seed, args)
+            episodes = result["episodes"] if result["episodes"] is not None else "-"
+            seconds = f"{result['seconds']:.1f}" if result["seconds"] is not None else "-"
+            print(f"{label:>12} {seed:>5} {episodes:>9} {seconds:>9} {result['win_rate']:>9.2f}")
+            if result["seconds"] is not None:
+                times.append(result["seconds"])
+        reached = f"{len(times)}/{len(args.seeds)} reached"
+        mean = f"mean {np.mean(times):.1f}s" if times else "never reached"
+        print(f"{label:>12} {reached}, {mean}")
+
+if __name__ == "__main__":
+    main()